@@ -0,0 +1,45 @@
+"""Checks the heap-based routing engine and the KANI route table against the original A* for every KANI node
+pair, and times all three.
+Run from the repository root: python -m benchmarks.astar_equivalence"""
+import time
+from benchmarks import reference
+from cogs.rails import RailTraverse
+
+
+def main():
+    kani_json, graph = RailTraverse.KANI_JSON, RailTraverse.KANI_GRAPH
+    pairs = [(a, b) for a in kani_json for b in kani_json]
+
+    start = time.perf_counter()
+    expected = [reference.kani_route(kani_json, a, b) for a, b in pairs]
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = [RailTraverse.astar(graph, graph.ids[a], graph.ids[b]) for a, b in pairs]
+    compiled_time = time.perf_counter() - start
+
+    table = RailTraverse.KANI_ROUTES
+    start = time.perf_counter()
+    tabled = [RailTraverse.table_route(table, graph.ids[a], graph.ids[b]) for a, b in pairs]
+    table_time = time.perf_counter() - start
+
+    mismatches = []
+    for (a, b), old, new, looked_up in zip(pairs, expected, actual, tabled):
+        old_out = RailTraverse.kani_formatting(*old) if len(old[0]) > 0 else ""
+        new_out = RailTraverse.kani_formatting(*new) if len(new[0]) > 0 else ""
+        if old != new or old != looked_up or old_out != new_out:
+            mismatches.append((a, b))
+
+    print("{0} pairs, {1} mismatches".format(len(pairs), len(mismatches)))
+    for a, b in mismatches[:10]:
+        print("  mismatch: {0} -> {1}".format(a, b))
+    print("original A*: {0:.3f}s ({1:.1f}us/route)".format(reference_time, reference_time / len(pairs) * 1e6))
+    print("compiled A*: {0:.3f}s ({1:.1f}us/route)".format(compiled_time, compiled_time / len(pairs) * 1e6))
+    print("route table: {0:.3f}s ({1:.1f}us/route)".format(table_time, table_time / len(pairs) * 1e6))
+    print("speedup: {0:.1f}x (A*), {1:.1f}x (route table)"
+          .format(reference_time / compiled_time, reference_time / table_time))
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,98 @@
+"""Checks that a deploy which only turns on `autocomplete` for existing command options reaches Discord. The bot's
+slash cogs are loaded for their real commands, and Discord is stood in for by a fake command API holding what the
+previous deploy registered: the same commands without `autocomplete`. discord_slash's own sync shouldn't see a
+difference; sync_options followed by that sync (as main.py's Slash runs them) should register the commands once,
+and then leave them alone.
+Run from the repository root: python -m benchmarks.command_sync"""
+import asyncio
+import copy
+import os
+from discord import Intents
+from discord.ext import commands
+from discord_slash import SlashCommand
+
+os.environ.setdefault("DATABASE_URL", "postgresql://unused")
+from cogs.CommandRegistry import sync_options  # noqa: E402
+
+EXTENSIONS = ["RailUtils", "ServerUtils", "Config", "Diagnostics"]  # the ones with slash commands
+
+
+class Discord:
+    """Just the command endpoints discord_slash syncs through, listing what was last registered (with ids) and
+    recording every registration."""
+    def __init__(self, registered: dict):
+        self.registered = registered  # scope -> command dicts
+        self.puts = []
+
+    async def get_all_commands(self, guild_id=None):
+        return [dict(copy.deepcopy(cmd), id=str(i + 1), application_id="1", version="1")
+                for i, cmd in enumerate(self.registered.get(guild_id, []))]
+
+    async def put_slash_commands(self, slash_commands, guild_id=None):
+        self.puts.append(guild_id)
+        self.registered[guild_id] = copy.deepcopy(slash_commands)
+        return await self.get_all_commands(guild_id)
+
+    async def get_all_guild_commands_permissions(self, guild_id):
+        return []
+
+    async def update_guild_commands_permissions(self, guild_id, permissions):
+        pass
+
+
+def without_autocomplete(options: list):
+    stripped = []
+    for option in options:
+        option = {key: value for key, value in option.items() if key != "autocomplete"}
+        if "options" in option:
+            option["options"] = without_autocomplete(option["options"])
+        stripped.append(option)
+    return stripped
+
+
+def autocompleted(commands: list):
+    return sorted("/{0} {1}".format(cmd["name"], option["name"]) for cmd in commands
+                  for option in cmd.get("options", []) if option.get("autocomplete"))
+
+
+async def main():
+    bot = commands.Bot(command_prefix="%", help_command=None, intents=Intents.default())
+    slash = SlashCommand(bot)
+    for extension in EXTENSIONS:
+        bot.load_extension("cogs." + extension)
+    for task in asyncio.all_tasks():  # the data refreshes the cogs start
+        if task is not asyncio.current_task():
+            task.cancel()
+    bot._ready.set()  # to_dict waits for the bot to be ready
+
+    ours = (await slash.to_dict())["global"]
+    previous = [dict({key: value for key, value in cmd.items() if key != "permissions"},
+                     options=without_autocomplete(cmd["options"])) for cmd in ours]
+    wanted = autocompleted(ours)
+
+    failed = []
+
+    def check(label, ok):
+        print("{0:60s} {1}".format(label, "ok" if ok else "FAILED"))
+        if not ok:
+            failed.append(label)
+
+    slash.req = Discord({None: copy.deepcopy(previous)})
+    await slash.sync_all_commands()
+    check("discord_slash's sync alone sends nothing", slash.req.puts == [])
+
+    slash.req = Discord({None: copy.deepcopy(previous)})
+    await sync_options(slash)
+    await slash.sync_all_commands()
+    registered = autocompleted(slash.req.registered[None])
+    check("registered once with autocomplete on {0}".format(", ".join(registered)),
+          slash.req.puts == [None] and registered == wanted and len(wanted) != 0)
+
+    await sync_options(slash)
+    await slash.sync_all_commands()
+    check("nothing registered again on the next start", slash.req.puts == [None])
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
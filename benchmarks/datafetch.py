@@ -0,0 +1,113 @@
+"""Checks the conditional downloads in DataFetch against a local stand-in for raw.githubusercontent.com, which serves
+one JSON file with an ETag and records the validators every request carries. Refreshes are run the way the refresh
+tasks run them: a first download should be rebuilt from, a repeat should be answered 304 without a rebuild, a
+changed file should be rebuilt again, and a server that stops sending validators should have an unchanged body
+caught by its hash. A rebuild that raises must not mark its version as applied, so the next refresh downloads it
+again, and a server that keeps failing should count as failed without a rebuild.
+Run from the repository root: python -m benchmarks.datafetch"""
+import asyncio
+import json
+import time
+from aiohttp import web
+from prometheus_client import REGISTRY
+
+
+def stand_in(served: dict, requests: list):
+    """The stand-in app, serving `served["body"]` with `served["etag"]` (if any) and answering 304 when the request
+    carries that ETag; `requests` collects the If-None-Match header of every request."""
+    async def data(request):
+        requests.append(request.headers.get("If-None-Match"))
+        if served.get("fail"):
+            raise web.HTTPInternalServerError()
+        etag = served.get("etag")
+        if etag is not None and request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        headers = {"ETag": etag} if etag is not None else {}
+        return web.Response(body=json.dumps(served["body"]).encode(), headers=headers,
+                            content_type="application/json")
+
+    app = web.Application()
+    app.router.add_get("/data.json", data)
+    return app
+
+
+async def main():
+    served, requests = {}, []
+    runner = web.AppRunner(stand_in(served, requests))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    url = "http://127.0.0.1:{0}/data.json".format(site._server.sockets[0].getsockname()[1])
+    from cogs import DataFetch
+    DataFetch.BACKOFF = 0.01
+
+    rebuilt = []
+
+    async def refresh(broken=False):
+        """What the refresh tasks do with a download: skip it if unchanged, otherwise rebuild and mark it applied."""
+        [data] = await DataFetch.fetch_all(url)
+        if data is None:
+            return
+        start = time.perf_counter()
+        if broken:
+            raise ValueError("rebuild failed")
+        rebuilt.append(data)
+        DataFetch.applied(url, time.perf_counter() - start)
+
+    def fetches(result):
+        return REGISTRY.get_sample_value("molebot_fetches_total", {"url": url, "result": result}) or 0
+
+    failed = []
+
+    def check(label, ok):
+        print("{0:60s} {1}".format(label, "ok" if ok else "FAILED"))
+        if not ok:
+            failed.append(label)
+
+    source = DataFetch.sources.setdefault(url, DataFetch.Source())
+    served.update(body={"version": 1}, etag='"v1"')
+    await refresh()
+    check("first download rebuilt", rebuilt == [{"version": 1}] and requests == [None])
+    check("its ETag committed once applied", source.etag == '"v1"' and source.pending is None)
+
+    await refresh()
+    check("repeat sent If-None-Match and got 304", requests[-1] == '"v1"' and fetches("not_modified") == 1)
+    check("no rebuild on 304", len(rebuilt) == 1)
+
+    served.update(body={"version": 2}, etag='"v2"')
+    try:
+        await refresh(broken=True)
+        raised = False
+    except ValueError:
+        raised = True
+    check("changed download handed to the rebuild", raised and fetches("changed") == 2)
+    check("failed rebuild left the applied validators alone", source.etag == '"v1"' and len(rebuilt) == 1)
+
+    await refresh()
+    check("next refresh downloaded the change again", requests[-1] == '"v1"' and rebuilt[-1] == {"version": 2})
+    check("its ETag committed once applied", source.etag == '"v2"')
+
+    await refresh()
+    check("304 for the new version", requests[-1] == '"v2"' and fetches("not_modified") == 2 and len(rebuilt) == 2)
+
+    del served["etag"]  # the same body, without validators
+    await refresh()
+    check("unchanged body caught by its hash", fetches("unchanged") == 1 and len(rebuilt) == 2)
+
+    served["body"] = {"version": 3}
+    await refresh()
+    check("changed body without validators rebuilt", rebuilt[-1] == {"version": 3} and source.etag is None)
+
+    served["fail"] = True
+    count = len(requests)
+    await refresh()
+    check("failing server retried {0} times, then skipped".format(DataFetch.RETRIES),
+          len(requests) - count == DataFetch.RETRIES and fetches("failed") == 1 and len(rebuilt) == 3)
+
+    await DataFetch.close_session()
+    await runner.cleanup()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
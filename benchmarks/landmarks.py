@@ -0,0 +1,42 @@
+"""Checks the landmark (ALT) and bidirectional searches against astar for every KANI node pair, and compares how
+many nodes each expands. Tied routes are handed back to astar by both searches; those are counted separately.
+Run from the repository root: python -m benchmarks.landmarks"""
+import time
+from cogs.rails import RailTraverse
+
+
+def run(search, pairs):
+    """Runs a search over every pair, returning the results, expansions and time taken."""
+    stats = {"expanded": 0}
+    start = time.perf_counter()
+    results = [search(a, b, stats) for a, b in pairs]
+    return results, stats["expanded"], time.perf_counter() - start
+
+
+def main():
+    graph = RailTraverse.KANI_GRAPH
+    landmarks = RailTraverse.build_landmarks(graph)
+    pairs = [(a, b) for a in range(len(graph)) for b in range(len(graph))]
+
+    expected, astar_expanded, astar_time = run(lambda a, b, stats: RailTraverse.astar(graph, a, b, stats), pairs)
+    print("{0} pairs, {1} landmarks".format(len(pairs), len(landmarks.landmarks)))
+    print("astar:         {0:9d} nodes expanded, {1:.2f}s".format(astar_expanded, astar_time))
+
+    failed = 0
+    for name, search in (("alt", RailTraverse.alt_search), ("bidirectional", RailTraverse.bidirectional_search)):
+        results, expanded, elapsed = run(lambda a, b, stats: search(landmarks, a, b, stats), pairs)
+        tied = sum(1 for result in results if result is None)
+        # What search_route returns: tied routes are answered by astar
+        answers = [old if new is None else new for old, new in zip(expected, results)]
+        mismatches = [pair for pair, old, new in zip(pairs, expected, answers) if old != new]
+        failed += len(mismatches)
+        print("{0:14s} {1:9d} nodes expanded ({2:.1%} of astar), {3:.2f}s, {4} tied routes left to astar, "
+              "{5} mismatches".format(name + ":", expanded, expanded / astar_expanded, elapsed, tied,
+                                      len(mismatches)))
+        for a, b in mismatches[:10]:
+            print("  mismatch: {0} -> {1}".format(graph.names[a], graph.names[b]))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
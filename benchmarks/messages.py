@@ -0,0 +1,125 @@
+"""Replays a stream of ordinary chat messages through the message dispatcher and through the two original
+per-message handlers, checking that both send the same replies and comparing throughput and how often each
+looks up server settings. Nothing is sent to Discord; the settings come from a pre-filled SETTINGS_CACHE.
+Run from the repository root: python -m benchmarks.messages [--messages 200000]"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from benchmarks import reference
+
+os.environ.setdefault("DATABASE_URL", "postgresql://unused")
+from cogs import Messages, Settings  # noqa: E402
+
+WORDS = ["the", "rail", "to", "is", "anyone", "on", "lol", "where", "dest", "mta", "yeah", "nether", "i", "think",
+         "claim", "we", "should", "build", "a", "bastion", "near", "spawn", "ok", "brb", "x", "z", "1200", "-340",
+         "[", "]", "wiki", "page", "[link]", "civ", "pearl", "vault", "snitch", "hi", "gg", "what", "time"]
+
+
+class Channel:
+    def __init__(self, sent: list):
+        self.sent = sent
+
+    async def send(self, content):
+        self.sent.append(("send", content))
+
+
+class Message:
+    """Just the parts of discord.Message the handlers read, recording what they send."""
+    __slots__ = ("content", "author", "guild", "channel", "sent")
+
+    def __init__(self, content: str, bot: bool, guild):
+        self.content = content
+        self.author = Author(bot)
+        self.guild = guild
+        self.sent = []
+        self.channel = Channel(self.sent)
+
+    async def reply(self, content, mention_author=True):
+        self.sent.append(("reply", content))
+
+
+class Author:
+    __slots__ = ("bot", "id")
+
+    def __init__(self, bot: bool):
+        self.bot = bot
+        self.id = 1
+
+
+class Guild:
+    __slots__ = ("id", "name")
+
+    def __init__(self, id: int):
+        self.id = id
+        self.name = "guild {0}".format(id)
+
+
+def chat(count: int, seed: int = 0):
+    """Mostly plain chat, with the occasional [[wiki link]], "delusional", and bot message."""
+    rng = random.Random(seed)
+    guilds = [Guild(i) for i in range(50)]
+    messages = []
+    for _ in range(count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(1, 25))]
+        roll = rng.random()
+        if roll < 0.005:
+            words.insert(rng.randrange(len(words) + 1), "[[{0}]]".format(rng.choice(["Mount September", "Icenia",
+                                                                                        "Rail", " "])))
+        elif roll < 0.007:
+            words.append("delusional")
+        messages.append((" ".join(words), rng.random() < 0.05, rng.choice(guilds)))
+    return messages
+
+
+async def replay(stream: list, handle):
+    """Runs every message through `handle`, returning the replies and the time taken."""
+    messages = [Message(content, bot, guild) for content, bot, guild in stream]
+    start = time.perf_counter()
+    for message in messages:
+        await handle(message)
+    return [message.sent for message in messages], time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the message dispatcher on replayed chat.")
+    parser.add_argument("--messages", type=int, default=200000)
+    args = parser.parse_args()
+    stream = chat(args.messages)
+    # Half the servers have wiki querying on
+    Settings.SETTINGS_CACHE.update({i: {"mole": False, "wiki": i % 2 == 0} for i in range(50)})
+
+    lookups = {"old": 0, "new": 0}
+
+    async def old_setting(server_id):
+        lookups["old"] += 1
+        return await Settings.get_wiki_setting(server_id)
+
+    async def new_settings(server_id):
+        lookups["new"] += 1
+        return await Settings.get_settings(server_id)
+
+    async def old(message):  # discord.py ran both listeners on every message
+        await reference.on_message(message, old_setting)
+        await reference.wikipage(message, old_setting)
+
+    Messages.get_settings = new_settings
+    old_sent, old_time = await replay(stream, old)
+    new_sent, new_time = await replay(stream, Messages.dispatch)
+
+    mismatches = [i for i, (a, b) in enumerate(zip(old_sent, new_sent)) if a != b]
+    replies = sum(1 for sent in new_sent if sent)
+    print("{0} messages, {1} answered".format(len(stream), replies))
+    print("original handlers: {0:10.0f} messages/s, {1} settings lookups".format(len(stream) / old_time,
+                                                                                 lookups["old"]))
+    print("dispatcher:        {0:10.0f} messages/s, {1} settings lookups ({2:.1f}x faster)"
+          .format(len(stream) / new_time, lookups["new"], old_time / new_time))
+    print("{0} messages answered differently".format(len(mismatches)))
+    for i in mismatches[:10]:
+        print("  {0!r}: {1} vs {2}".format(stream[i][0], old_sent[i], new_sent[i]))
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
@@ -0,0 +1,162 @@
+"""Checks /ping's server status lookups against local stand-in Minecraft servers: one that answers the status
+protocol after a short delay (counting how often it is asked), one that accepts connections but never answers,
+ones that answer with garbage or hang up halfway, and a closed port. Concurrent pings of one host should share a
+single probe, repeats should come from the cache until it expires, the silent server should give up at the
+timeout, bad answers should be reported rather than raise, and the default server should be answered from the
+background poll until that goes stale.
+Run from the repository root: python -m benchmarks.ping"""
+import asyncio
+import json
+import time
+
+DELAY = 0.2
+STATUS = {"version": {"name": "Stand-in 1.18", "protocol": 757}, "players": {"max": 300, "online": 42},
+          "description": "§aA stand-in §rserver"}
+
+
+def varint(value: int):
+    out = b""
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        out += bytes([byte | (0x80 if value else 0)])
+        if not value:
+            return out
+
+
+async def read_varint(reader):
+    value, shift = 0, 0
+    while True:
+        byte = (await reader.readexactly(1))[0]
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value
+
+
+async def read_packet(reader):
+    return await reader.readexactly(await read_varint(reader))
+
+
+def packet(body: bytes):
+    return varint(len(body)) + body
+
+
+def stand_in(probes: list, status: dict = STATUS):
+    """A server speaking just enough of the status protocol: handshake, status request, ping."""
+    async def handle(reader, writer):
+        try:
+            await read_packet(reader)  # handshake
+            await read_packet(reader)  # status request
+            probes.append(time.perf_counter())
+            await asyncio.sleep(DELAY)
+            text = json.dumps(status).encode()
+            writer.write(packet(b"\x00" + varint(len(text)) + text))
+            ping = await read_packet(reader)
+            writer.write(packet(b"\x01" + ping[1:9]))
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    return handle
+
+
+async def silent(reader, writer):
+    """A server that accepts connections and never answers."""
+    try:
+        await asyncio.sleep(3600)
+    except asyncio.CancelledError:  # still waiting when the run ends
+        writer.close()
+
+
+async def cut_off(reader, writer):
+    """A server that hangs up halfway through its status response."""
+    await read_packet(reader)
+    await read_packet(reader)
+    writer.write(varint(100) + b"\x00")
+    await writer.drain()
+    writer.close()
+
+
+async def main():
+    from cogs import ServerStatus
+    probes = []
+    server = await asyncio.start_server(stand_in(probes), "127.0.0.1", 0)
+    quiet = await asyncio.start_server(silent, "127.0.0.1", 0)
+    host = "127.0.0.1:{0}".format(server.sockets[0].getsockname()[1])
+    quiet_host = "127.0.0.1:{0}".format(quiet.sockets[0].getsockname()[1])
+    ServerStatus.PING_TIMEOUT = 1.0
+
+    failed = []
+
+    def check(label, ok):
+        print("{0:60s} {1}".format(label, "ok" if ok else "FAILED"))
+        if not ok:
+            failed.append(label)
+
+    snapshots = await asyncio.gather(*[ServerStatus.get_status(host) for _ in range(20)])
+    status = snapshots[0].status
+    check("status read", status is not None and status.players.online == 42 and
+          status.version.name == "Stand-in 1.18")
+    check("20 concurrent pings share one probe ({0})".format(len(probes)),
+          len(probes) == 1 and all(s is snapshots[0] for s in snapshots))
+    start = time.perf_counter()
+    await ServerStatus.get_status(host.upper())
+    check("repeat ping cached ({0:.3f}s)".format(time.perf_counter() - start), len(probes) == 1)
+    ServerStatus.STATUSES.ttl = 0
+    ServerStatus.STATUSES.clear()
+    await ServerStatus.get_status(host)
+    await ServerStatus.get_status(host)
+    check("expired results pinged again", len(probes) == 3)
+    ServerStatus.STATUSES.ttl = 30
+
+    start = time.perf_counter()
+    snapshot = await ServerStatus.get_status(quiet_host)
+    elapsed = time.perf_counter() - start
+    check("silent server gives up at the timeout ({0:.2f}s: {1})".format(elapsed, snapshot.error),
+          snapshot.status is None and "timed out" in snapshot.error and elapsed < 1.5)
+    start = time.perf_counter()
+    await ServerStatus.get_status(quiet_host)
+    check("failed ping cached too", time.perf_counter() - start < 0.1)
+
+    snapshot = await ServerStatus.get_status("127.0.0.1:1")
+    check("closed port reported ({0})".format(snapshot.error), snapshot.status is None and snapshot.error != "")
+
+    # A chat component without "text", which mcstatus fails on with a KeyError rather than an IOError
+    garbled = await asyncio.start_server(stand_in([], status=dict(STATUS, description={"extra": [{"bold": True}]})),
+                                         "127.0.0.1", 0)
+    hang_up = await asyncio.start_server(cut_off, "127.0.0.1", 0)
+    for label, bad in [("garbled status", garbled), ("cut off status", hang_up)]:
+        snapshot = await ServerStatus.fetch_status("127.0.0.1:{0}".format(bad.sockets[0].getsockname()[1]))
+        check("{0} reported ({1})".format(label, snapshot.error), snapshot.status is None and snapshot.error != "")
+        bad.close()
+
+    # Poll the stand-in as the default server, then /ping it without an address
+    ServerStatus.DEFAULT_SERVER = host
+    ServerStatus.poll_default.change_interval(seconds=0.5)
+    ServerStatus.poll_default.start()
+    await asyncio.sleep(DELAY * 2)
+    polled = len(probes)
+    start = time.perf_counter()
+    snapshot = await ServerStatus.get_status(host)
+    check("default server answered from the poll ({0:.4f}s)".format(time.perf_counter() - start),
+          snapshot is ServerStatus.latest and snapshot.status is not None and len(probes) == polled)
+    await asyncio.sleep(0.6)
+    check("poll repeats", len(probes) > polled)
+    ServerStatus.poll_default.cancel()
+
+    # A poll loop that stopped shouldn't keep answering with its last result
+    ServerStatus.latest.checked -= ServerStatus.STALE_AFTER
+    ServerStatus.STATUSES.clear()
+    polled = len(probes)
+    snapshot = await ServerStatus.get_status(host)
+    check("stale poll result pinged again", snapshot is not ServerStatus.latest and len(probes) == polled + 1)
+
+    server.close()
+    quiet.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
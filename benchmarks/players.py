@@ -0,0 +1,129 @@
+"""Checks the /whois player lookups against a local stand-in for the Mojang and CivWiki endpoints, which answers
+every request after a fixed delay and counts them: concurrent lookups of one player should share one request per
+endpoint, the name history and wiki page should be fetched concurrently, repeated lookups should be served from
+the caches, a failing wiki shouldn't fail the lookup, and Mojang rate limits and server errors should fail it
+without being cached.
+Run from the repository root: python -m benchmarks.players"""
+import asyncio
+import os
+import time
+import aiohttp
+from aiohttp import web
+
+DELAY = 0.2
+PLAYERS = {"specificlanguage": "0b1d7ff7b1d64b1c9c4a8c5a1f1f2e3d"}
+HISTORY = [{"name": "oldname"}, {"name": "specificlanguage", "changedToAt": 1600000000000}]
+WIKI_PAGES = {"specificlanguage"}
+RATE_LIMITED = "ratelimited"  # a username Mojang answers 429 for
+BROKEN_UUID = "ffffffffffffffffffffffffffffffff"  # a UUID whose name history Mojang answers 500 for
+
+
+def stand_in(requests: dict):
+    """The stand-in app, counting requests by endpoint in `requests`."""
+    async def uuid(request):
+        requests["uuid"] = requests.get("uuid", 0) + 1
+        await asyncio.sleep(DELAY)
+        name = request.match_info["name"].lower()
+        if name == RATE_LIMITED:
+            return web.Response(status=429)
+        if name not in PLAYERS:
+            return web.Response(status=204)
+        return web.json_response({"id": PLAYERS[name], "name": name})
+
+    async def names(request):
+        requests["names"] = requests.get("names", 0) + 1
+        await asyncio.sleep(DELAY)
+        if request.match_info["uuid"] == BROKEN_UUID:
+            raise web.HTTPInternalServerError()
+        return web.json_response(HISTORY)
+
+    async def wiki(request):
+        requests["wiki"] = requests.get("wiki", 0) + 1
+        await asyncio.sleep(DELAY)
+        if request.match_info["page"] == "broken":
+            raise web.HTTPInternalServerError()
+        return web.Response(status=200 if request.match_info["page"].lower() in WIKI_PAGES else 404)
+
+    app = web.Application()
+    app.router.add_get("/users/profiles/minecraft/{name}", uuid)
+    app.router.add_get("/user/profiles/{uuid}/names", names)
+    app.router.add_route("HEAD", "/wiki/{page}", wiki)
+    return app
+
+
+async def raises(lookup):
+    """Whether a lookup failed the way /whois reports as Mojang being unreachable."""
+    try:
+        await lookup
+    except aiohttp.ClientError:
+        return True
+    return False
+
+
+async def main():
+    requests = {}
+    runner = web.AppRunner(stand_in(requests))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    os.environ["mojang_url"] = os.environ["civwiki_url"] = "http://127.0.0.1:{0}".format(port)
+    from cogs import DataFetch, Players
+
+    failed = []
+
+    def check(label, ok):
+        print("{0:60s} {1}".format(label, "ok" if ok else "FAILED"))
+        if not ok:
+            failed.append(label)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*[Players.lookup("SpecificLanguage") for _ in range(20)])
+    elapsed = time.perf_counter() - start
+    uuid, history, (url, exists) = results[0]
+    check("20 concurrent lookups agree", all(result == results[0] for result in results))
+    check("found the UUID, history and wiki page", uuid == PLAYERS["specificlanguage"] and history == HISTORY and
+          exists and url.endswith("/wiki/SpecificLanguage"))
+    check("one request per endpoint ({0})".format(requests), requests == {"uuid": 1, "names": 1, "wiki": 1})
+    check("history and wiki fetched concurrently ({0:.2f}s)".format(elapsed), elapsed < 2.5 * DELAY)
+
+    start = time.perf_counter()
+    await Players.lookup("SpecificLanguage")
+    check("repeat lookup served from the caches ({0:.3f}s)".format(time.perf_counter() - start),
+          requests == {"uuid": 1, "names": 1, "wiki": 1})
+
+    check("unused username", await Players.lookup("nobody") is None and requests["uuid"] == 2)
+    await Players.lookup("nobody")
+    check("unused username cached too", requests["uuid"] == 2)
+
+    PLAYERS["broken"] = PLAYERS["specificlanguage"]
+    check("wiki server error reported as no page", (await Players.lookup("broken"))[2][1] is False)
+    wiki_requests = requests["wiki"]
+    await Players.lookup("broken")
+    check("failed wiki check not cached", requests["wiki"] == wiki_requests + 1)
+
+    Players.UUIDS.ttl = DELAY
+    Players.UUIDS.clear()
+    await Players.lookup("specificlanguage")
+    await asyncio.sleep(DELAY)
+    await Players.lookup("specificlanguage")
+    check("expired UUID fetched again", requests["uuid"] == 5)
+    Players.UUIDS.ttl = 3600
+
+    for attempt in range(2):
+        uuid_requests = requests["uuid"]
+        check("rate limited UUID lookup raises (try {0})".format(attempt + 1),
+              await raises(Players.lookup(RATE_LIMITED)) and requests["uuid"] == uuid_requests + 1)
+    PLAYERS["unlucky"] = BROKEN_UUID
+    for attempt in range(2):
+        names_requests = requests["names"]
+        check("name history server error raises (try {0})".format(attempt + 1),
+              await raises(Players.lookup("unlucky")) and requests["names"] == names_requests + 1)
+
+    await DataFetch.close_session()
+    await runner.cleanup()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
@@ -0,0 +1,140 @@
+import re
+from math import dist
+from string import whitespace
+
+
+# Frozen copy of the original object-based KANI A* (linear open list scan), kept so the compiled
+# routing engine can be checked against it. Do not optimize this file.
+class RailNode:
+    """KANI object node, as used by the original implementation."""
+    def __init__(self, name: str, data: dict):
+        self.name = name
+        self.x = data.get("x", 0)
+        self.z = data.get("z", 0)
+        self.links = data.get("links", [])
+        self.parent = None
+        self.station = data.get("station", False)
+        self.switch = data.get("switch", False)
+        self.badlinks = data.get("BadLinks", {})
+        self.stop = not (self.station or self.switch)
+
+    def __eq__(self, other):
+        return self.name == other.name
+
+
+def euclid(start, end):
+    return dist([start.x, start.z], [end.x, end.z])
+
+
+def taxi(start, end):
+    return sum([abs(start.x - end.x), abs(start.z - end.z)])
+
+
+def reconstruct_path(node: RailNode):
+    path = []
+    if node.station:
+        path.append(node.name + ":exit")
+    path.append(node.name)
+    tot_dist = 0
+
+    while node.parent is not None:
+        tot_dist += (euclid(node, node.parent) + taxi(node, node.parent)) / 2
+        if node.name in node.parent.badlinks.keys():
+            path.append(node.parent.badlinks.get(node.name))
+        else:
+            path.append(node.name)
+        node = node.parent
+
+    path.append(node.name)
+
+    new_path = []
+    for i in path:
+        for j in reversed(i.split(" ")):
+            new_path.append(j)
+
+    lookup = set()
+    path = [x for x in new_path if x not in lookup and lookup.add(x) is None]
+    return path[::-1], tot_dist
+
+
+def kani_route(kani_json: dict, start: str, end: str):
+    """Routes between two KANI node names exactly as the original astar did."""
+    start_node, end_node = RailNode(start, kani_json[start]), RailNode(end, kani_json[end])
+    if start_node == end_node:
+        return [], -2
+
+    open_list = {start_node.name: {"node": start_node, "f": euclid(start_node, end_node), "g": 0}}
+    closed_list = {}
+
+    while not len(open_list) == 0:
+        current_name = min(open_list, key=lambda k: open_list[k]["f"])
+        current = open_list.pop(current_name)
+        closed_list.update({current_name: current})
+        current_node, g = current["node"], current["g"]
+
+        if current_node == end_node:
+            return reconstruct_path(current_node)
+        if current_node.stop and current_node != start_node:
+            continue
+
+        for link in current_node.links:
+            if link in closed_list:
+                continue
+            if link in open_list:
+                link_node = open_list[link]["node"]
+                link_g = open_list[link]["g"]
+            else:
+                link_node = RailNode(link, kani_json[link])
+                link_g = -1
+
+            tentative_gscore = g + (taxi(current_node, link_node) + euclid(current_node, link_node)) / 2
+            if link_g == -1 or tentative_gscore < link_g:
+                link_node.parent = current_node
+                open_list.update({link: {"node": link_node, "f": tentative_gscore + euclid(link_node, end_node),
+                                         "g": tentative_gscore}})
+
+    return [], 0
+
+
+# Frozen copies of the original linear /dest suggestion scans, for the station search benchmark.
+def find_alias(aliases, dest):
+    dest_list = set()
+    for key in aliases:
+        d = aliases[key]
+        if dest in key and d not in dest_list:
+            dest_list.add(d)
+    return dest_list
+
+
+def names_close_to(aliases, dest):
+    import difflib
+    close_matches = difflib.get_close_matches(dest, aliases.keys())
+    return set([aliases[key] for key in close_matches])
+
+
+# Frozen copies of the two original per-message handlers (main.on_message and ServerUtils.wikipage), kept so the
+# message dispatcher can be checked against them. `get_wiki_setting` is passed in rather than imported.
+async def on_message(message, get_wiki_setting):
+    if message.author.bot:
+        return
+    if "delusional" in message.content and "[[" not in message.content and \
+            not await get_wiki_setting(message.guild.id):
+        await message.channel.send("**Edit CivWiki:** https://civwiki.org")
+
+
+async def wikipage(message, get_wiki_setting):
+    if not await get_wiki_setting(message.guild.id) or message.author.bot:
+        return
+
+    def url(s: str):
+        return "https://civwiki.org/wiki/" + s.replace(" ", "_")
+
+    wiki_pattern = "\\[{2}([^\\]\n]+) *\\]{2}"
+    pages = re.findall(wiki_pattern, message.content)
+    pages = [page for page in pages if page not in whitespace]
+    if len(pages) != 0:
+        page_list = ""
+        page_list += "\n".join([url(page) for page in pages[:5]])
+        if len(pages) == 1:
+            page_list = page_list.replace("<", "").replace(">", "")
+        await message.reply(page_list, mention_author=False)
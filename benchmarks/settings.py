@@ -0,0 +1,149 @@
+"""Smoke check for the settings storage as the bot actually runs it: the extensions are loaded the way main.py
+loads them, the pool is opened on the Settings module main.py imports, and the /config and /profile commands and a
+few messages are then run through the loaded cogs against a real database, for a scratch server that is deleted
+again afterwards.
+Run from the repository root, with DATABASE_URL pointing at a database with the settings table:
+python -m benchmarks.settings"""
+import asyncio
+import asyncpg as apg
+from discord import Intents
+from discord.ext import commands
+from discord_slash import SlashCommand
+from prometheus_client import REGISTRY
+from cogs import Settings
+
+SERVER_ID = 999000000000000001
+EXTENSIONS = ["Config", "Diagnostics", "Messages"]  # the ones using the settings, loaded as main.py loads them
+
+
+class Permissions:
+    administrator = True
+    manage_messages = True
+
+
+class Author:
+    id = 1
+    bot = False
+    guild_permissions = Permissions()
+
+
+class Guild:
+    id = SERVER_ID
+    name = "settings smoke check"
+
+
+class Channel:
+    def __init__(self, sent: list):
+        self.sent = sent
+
+    async def send(self, content):
+        self.sent.append(content)
+
+
+class Message:
+    """Just the parts of discord.Message the message handler reads, recording what it sends."""
+    def __init__(self, content: str):
+        self.content = content
+        self.author = Author()
+        self.guild = Guild()
+        self.sent = []
+        self.channel = Channel(self.sent)
+
+    async def reply(self, content, mention_author=True):
+        self.sent.append(content)
+
+
+class Context:
+    """Just the parts of SlashContext the /config commands read, recording what they send."""
+    def __init__(self):
+        self.guild = Guild()
+        self.guild_id = SERVER_ID
+        self.author = Author()
+        self.sent = []
+
+    async def send(self, content=None, embed=None, hidden=False):
+        self.sent.append(embed.description if embed is not None else content)
+
+
+async def direct(query: str, *args):
+    """Runs a query straight on the database, bypassing the bot's pool and cache."""
+    conn = await apg.connect(dsn=Settings.DB_URL)
+    try:
+        return await conn.fetch(query, *args)
+    finally:
+        await conn.close()
+
+
+async def stored(server_id: int):
+    """Reads a server's row from the database."""
+    rows = await direct("SELECT mole, wiki FROM settings WHERE discord_id = $1;", server_id)
+    return dict(rows[0]) if rows else None
+
+
+def queries_run():
+    return sum(stats["count"] for stats in Settings.QUERY_STATS.values())
+
+
+async def main():
+    bot = commands.Bot(command_prefix="%", help_command=None, intents=Intents.default(), owner_id=Author.id)
+    slash = SlashCommand(bot)
+    for extension in EXTENSIONS:
+        bot.load_extension("cogs." + extension)
+
+    failed = []
+
+    def check(label, ok):
+        print("{0:60s} {1}".format(label, "ok" if ok else "FAILED"))
+        if not ok:
+            failed.append(label)
+
+    await Settings.create_pool()  # as Bot.start does
+    try:
+        await Settings.left_discord(SERVER_ID)
+
+        ctx = Context()
+        await slash.commands["config"].invoke(ctx)
+        check("/config answered through the loaded cog", ctx.sent == ["`/mole`: False\n`/wiki` output: False"])
+        check("/config created the server's row", await stored(SERVER_ID) == {"mole": False, "wiki": False})
+
+        ctx = Context()
+        await slash.subcommands["config"]["wiki"].invoke(ctx)
+        check("/config wiki enabled wiki querying", ctx.sent[0].startswith("Enabled"))
+        check("/config wiki stored the change", await stored(SERVER_ID) == {"mole": False, "wiki": True})
+
+        # Changed behind the bot's back, so only a reload can show it
+        await direct("UPDATE settings SET mole = TRUE WHERE discord_id = $1;", SERVER_ID)
+        await Settings.load_settings()  # as on_ready does
+        queries = queries_run()
+        ctx = Context()
+        await slash.commands["config"].invoke(ctx)
+        check("/config reads the settings loaded on ready", ctx.sent == ["`/mole`: True\n`/wiki` output: True"])
+        check("/config served from the cache without a query", queries_run() == queries)
+
+        Settings.POOL_STATS["in_use"] += 3  # as if three queries were holding connections
+        exported = REGISTRY.get_sample_value("molebot_state", {"name": "db_connections_in_use"})
+        Settings.POOL_STATS["in_use"] -= 3
+        check("pool gauge exports the connections in use ({0})".format(exported), exported == 3)
+
+        ctx = Context()
+        await slash.commands["profile"].invoke(ctx)
+        check("/profile reports the pool and the queries run",
+              "Database pool: 0/{0}".format(Settings.POOL_SIZE) in ctx.sent[0] and "`set_wiki`: " in ctx.sent[0])
+
+        messages = bot.get_cog("Messages")
+        message = Message("what does [[Icenia]] say about this")
+        await messages.on_message(message)
+        check("[[wiki link]] answered with the server's settings", message.sent == ["https://civwiki.org/wiki/Icenia"])
+        await slash.subcommands["config"]["wiki"].invoke(Context())
+        message = Message("that's delusional")
+        await messages.on_message(message)
+        check("\"delusional\" answered once wiki querying is off",
+              message.sent == ["**Edit CivWiki:** https://civwiki.org"])
+    finally:
+        await Settings.left_discord(SERVER_ID)
+        await Settings.close_pool()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
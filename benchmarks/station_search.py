@@ -0,0 +1,70 @@
+"""Compares the trigram station search against the original linear scans (substring test and difflib over every
+KANI alias) on misspelled /dest inputs, checking that find_alias still gives the same results and timing both.
+Run from the repository root: python -m benchmarks.station_search"""
+import random
+import time
+from benchmarks import reference
+from cogs.rails import RailTraverse
+
+
+def typos(names, count, seed=0):
+    """Misspells random station names with a deletion, insertion, substitution or swap, plus a few that are
+    truncated or made up entirely."""
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    queries = []
+    for _ in range(count):
+        name = rng.choice(names)
+        i = rng.randrange(len(name))
+        kind = rng.randrange(6)
+        if kind == 0:
+            name = name[:i] + name[i + 1:]
+        elif kind == 1:
+            name = name[:i] + rng.choice(letters) + name[i:]
+        elif kind == 2:
+            name = name[:i] + rng.choice(letters) + name[i + 1:]
+        elif kind == 3 and i < len(name) - 1:
+            name = name[:i] + name[i + 1] + name[i] + name[i + 2:]
+        elif kind == 4:
+            name = name[:max(i, 2)]
+        elif kind == 5:
+            name = "".join(rng.choice(letters) for _ in range(rng.randrange(3, 12)))
+        queries.append(name)
+    return queries
+
+
+def timed(function, queries):
+    start = time.perf_counter()
+    results = [function(q) for q in queries]
+    return results, (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def main():
+    aliases = RailTraverse.KANI_ALIASES
+    queries = typos(list(aliases.keys()), 2000)
+
+    old_alias, old_alias_time = timed(lambda q: reference.find_alias(aliases, q), queries)
+    new_alias, new_alias_time = timed(RailTraverse.find_alias, queries)
+    old_close, old_close_time = timed(lambda q: reference.names_close_to(aliases, q), queries)
+    new_close, new_close_time = timed(RailTraverse.names_close_to, queries)
+
+    mismatches = [q for q, old, new in zip(queries, old_alias, new_alias) if old != new]
+    # The edit distance ranking is not meant to reproduce difflib, so only report how the suggestions compare
+    found = sum(1 for old, new in zip(old_close, new_close) if len(old) == 0 or len(old & new) > 0)
+    empty = sum(1 for new in new_close if len(new) == 0)
+
+    print("{0} queries over {1} KANI aliases ({2} entries with AURA names)"
+          .format(len(queries), len(aliases), len(RailTraverse.STATION_SEARCH)))
+    print("find_alias:     {0:8.1f}us -> {1:6.1f}us per query ({2:.1f}x), {3} mismatches"
+          .format(old_alias_time, new_alias_time, old_alias_time / new_alias_time, len(mismatches)))
+    print("names_close_to: {0:8.1f}us -> {1:6.1f}us per query ({2:.1f}x)"
+          .format(old_close_time, new_close_time, old_close_time / new_close_time))
+    print("suggestions sharing a station with difflib's (or difflib had none): {0:.1%}, no suggestion: {1:.1%}"
+          .format(found / len(queries), empty / len(queries)))
+    for q in mismatches[:10]:
+        print("  mismatch: {0!r}".format(q))
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
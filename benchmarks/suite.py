@@ -0,0 +1,153 @@
+"""Benchmark suite for the routing, geo lookup and fuzzy matching hot paths, runnable without Discord or Postgres.
+Loads the resources/ of the repository (or of a world made by benchmarks.world), times every lookup over a query
+mix shaped like real command traffic, and writes the timings to a JSON file that later runs can compare against.
+Run from the repository root: python -m benchmarks.suite [--world DIR] [--output FILE] [--compare FILE]"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAP_RADIUS = 13000
+
+
+def percentile(ordered: list, fraction: float):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(function, queries: list):
+    """Calls `function(*query)` for every query, returning per-call timings in microseconds."""
+    times = []
+    for query in queries:
+        start = time.perf_counter()
+        function(*query)
+        times.append((time.perf_counter() - start) * 1e6)
+    times.sort()
+    return {"calls": len(times), "mean_us": sum(times) / len(times), "p50_us": percentile(times, 0.5),
+            "p95_us": percentile(times, 0.95), "max_us": times[-1]}
+
+
+def route_queries(rng: random.Random, names: list, aliases: list, typos: list, count: int):
+    """Station pairs for /dest: mostly exact names, some aliases and some misspellings (which go through the
+    alias search, and usually fail)."""
+    def pick():
+        roll = rng.random()
+        if roll < 0.8 or len(aliases) == 0:
+            return rng.choice(names)
+        return rng.choice(aliases) if roll < 0.9 else rng.choice(typos)
+    return [(pick(), pick()) for _ in range(count)]
+
+
+def point_queries(rng: random.Random, anchors: list, count: int):
+    """Coordinates for /whereis and /finddests: most near a settlement or stop, the rest anywhere on the map."""
+    points = []
+    for _ in range(count):
+        if rng.random() < 0.7:
+            x, z = rng.choice(anchors)
+            points.append((int(rng.gauss(x, 300)), int(rng.gauss(z, 300))))
+        else:
+            points.append((rng.randint(-MAP_RADIUS, MAP_RADIUS), rng.randint(-MAP_RADIUS, MAP_RADIUS)))
+    return points
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(world: str, count: int, seed: int):
+    """Loads the world and times every hot path over `count` queries each, returning the report."""
+    # The modules load resources/ relative to the working directory when first imported
+    os.chdir(world)
+    start = time.perf_counter()
+    from cogs import CivMap
+    from cogs.rails import RailTraverse
+    from cogs.rails.RailHelpers import find_closest_dests
+    from benchmarks.station_search import typos
+    load = time.perf_counter() - start
+
+    rng = random.Random(seed)
+    kani_names = [name for name in RailTraverse.KANI_GRAPH.names if not name.startswith("j:")]
+    kani_aliases = [alias for alias, name in RailTraverse.KANI_ALIASES.items() if alias != name]
+    aura_stops = list(RailTraverse.AURA_DESTS.names)
+    aura_names = [name for name, key in RailTraverse.get_aura_names().items() if name != key]
+    all_names = list(RailTraverse.KANI_ALIASES.keys()) + aura_stops
+    misspelled = typos(all_names, count, seed)
+
+    anchors = [(s["x"], s["z"]) for s in CivMap.settlements if "x" in s and "z" in s]
+    anchors += list(zip(RailTraverse.KANI_DESTS.x, RailTraverse.KANI_DESTS.z))
+    points = point_queries(rng, anchors, count)
+    prefixes = [(name[:rng.randint(1, 4)],) for name in misspelled]
+
+    benchmarks = {
+        "find_kani_route": (RailTraverse.find_kani_route,
+                            route_queries(rng, kani_names, kani_aliases, misspelled, count)),
+        "find_aura_route": (RailTraverse.find_aura_route,
+                            route_queries(rng, aura_stops, aura_names, misspelled, count)),
+        "find_closest": (CivMap.find_closest, points),
+        "find_containing_poly": (CivMap.find_containing_poly, points),
+        "find_closest_dests": (find_closest_dests, points),
+        "find_closest_dests_aura": (lambda x, z: find_closest_dests(x, z, True), points),
+        "find_alias": (RailTraverse.find_alias, [(q,) for q in misspelled]),
+        "names_close_to": (RailTraverse.names_close_to, [(q,) for q in misspelled]),
+        "complete_station": (RailTraverse.complete_station, prefixes),
+    }
+    results = {}
+    for name, (function, queries) in benchmarks.items():
+        results[name] = measure(function, queries)
+        print("{0:24s} {1[mean_us]:10.1f}us mean {1[p50_us]:10.1f}us p50 {1[p95_us]:10.1f}us p95 "
+              "{1[max_us]:10.1f}us max".format(name, results[name]))
+
+    meta = {"revision": git_revision(), "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(), "world": os.path.abspath(world), "queries": count, "seed": seed,
+            "load_s": load, "kani_nodes": len(RailTraverse.KANI_GRAPH), "aura_nodes": len(RailTraverse.AURA_GRAPH),
+            "kani_route_table": RailTraverse.KANI_ROUTES is not None, "settlements": len(CivMap.settlements),
+            "claims": len(CivMap.claims)}
+    print("loaded in {0:.2f}s: {1} KANI nodes, {2} AURA nodes, {3} settlements, {4} claims"
+          .format(load, meta["kani_nodes"], meta["aura_nodes"], meta["settlements"], meta["claims"]))
+    return {"meta": meta, "results": results}
+
+
+def compare(report: dict, baseline: dict):
+    """Prints how each mean and p95 changed against an earlier report (ratios below 1 are faster)."""
+    print("against {0} ({1})".format(baseline["meta"].get("revision"), baseline["meta"].get("date")))
+    for name, result in report["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            print("{0:24s} (new)".format(name))
+            continue
+        print("{0:24s} mean {1:6.2f}x  p95 {2:6.2f}x".format(
+            name, result["mean_us"] / old["mean_us"], result["p95_us"] / old["p95_us"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MoleBot's routing, geo lookup and fuzzy matching.")
+    parser.add_argument("--world", default=ROOT, help="directory holding resources/ (default: the repository)")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare against the results in this JSON file")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.compare) if args.compare else None
+    sys.path.insert(0, ROOT)
+
+    report = run(args.world, args.queries, args.seed)
+    if output is not None:
+        with open(output, "w") as fp:
+            json.dump(report, fp, indent=2)
+    if baseline is not None:
+        with open(baseline, "r") as fp:
+            compare(report, json.load(fp))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""Synthetic world generator for the benchmark suite: writes KANI, AURA, settlement and claim files shaped like the
+real ones to <directory>/resources/, at whatever scale is asked for. Everything is derived from the seed, so the
+same arguments always give the same world.
+Run from the repository root: python -m benchmarks.world <directory> [--kani-nodes 10000] [--claims 2000] ..."""
+import argparse
+import json
+import math
+import os
+import random
+from cogs.PointIndex import PointIndex
+
+MAP_RADIUS = 12000
+SYLLABLES = ["ka", "ri", "mo", "len", "tor", "va", "sel", "un", "dra", "pi", "hol", "me", "zan", "qu", "ost", "bel",
+             "cor", "ny", "ash", "vin", "gra", "lu", "tem", "ex", "fi", "wen", "dor", "sa", "mir", "ul"]
+
+
+class Names:
+    """Hands out unique pronounceable names."""
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.used = set()
+
+    def __call__(self):
+        while True:
+            name = "".join(self.rng.choice(SYLLABLES) for _ in range(self.rng.randint(2, 4)))
+            if name not in self.used:
+                self.used.add(name)
+                return name
+
+
+def scatter(rng: random.Random, count: int, clusters: int = 40):
+    """Points spread over the map, clustered around a few centers like real settlement and rail density."""
+    centers = [(rng.uniform(-MAP_RADIUS, MAP_RADIUS), rng.uniform(-MAP_RADIUS, MAP_RADIUS)) for _ in range(clusters)]
+    points = []
+    for _ in range(count):
+        if rng.random() < 0.7:
+            cx, cz = rng.choice(centers)
+            x, z = rng.gauss(cx, 1500), rng.gauss(cz, 1500)
+        else:
+            x, z = rng.uniform(-MAP_RADIUS, MAP_RADIUS), rng.uniform(-MAP_RADIUS, MAP_RADIUS)
+        points.append((int(max(-MAP_RADIUS, min(MAP_RADIUS, x))), int(max(-MAP_RADIUS, min(MAP_RADIUS, z)))))
+    return points
+
+
+def link(nodes: dict, a: str, b: str):
+    if b not in nodes[a]["links"]:
+        nodes[a]["links"].append(b)
+    if a not in nodes[b]["links"]:
+        nodes[b]["links"].append(a)
+
+
+def connect(rng: random.Random, nodes: dict, names: list, points: list, neighbours: int):
+    """Links every point to some of its nearest neighbours (dropping the rest leaves detours for the router to work
+    around), and to a nearby earlier point so the network stays connected."""
+    index = PointIndex([p[0] for p in points], [p[1] for p in points])
+    for i, (x, z) in enumerate(points):
+        for j in index.nearest(x, z, neighbours + 1)[0].tolist():
+            if j != i and rng.random() < 0.6:
+                link(nodes, names[i], names[j])
+        if i > 0:  # the nearest of (a sample of) the earlier points, which is enough to keep it all connected
+            earlier = range(i) if i <= 64 else rng.sample(range(i), 64)
+            j = min(earlier, key=lambda k: (points[k][0] - x) ** 2 + (points[k][1] - z) ** 2)
+            link(nodes, names[i], names[j])
+
+
+def kani_world(rng: random.Random, names: Names, count: int):
+    """KANI export: switches ("j:" junctions) forming the network, stations on it, and terminal destinations
+    hanging off it (the stops)."""
+    switches, stations = int(count * 0.45), int(count * 0.15)
+    terminals = count - switches - stations
+    nodes, core, core_points = {}, [], scatter(rng, switches + stations)
+    for i, (x, z) in enumerate(core_points):
+        if i < switches:
+            name = "j:{0}:{1}".format(names(), rng.choice(["north", "south", "east", "west", "x"]))
+            nodes[name] = {"BadLinks": {}, "links": [], "name": name, "switch": True, "x": x, "y": 64, "z": z}
+        else:
+            name = names()
+            nodes[name] = {"BadLinks": {}, "links": [], "name": name, "station": True, "x": x, "y": 64, "z": z}
+        core.append(name)
+    connect(rng, nodes, core, core_points, 3)
+
+    index = PointIndex([p[0] for p in core_points], [p[1] for p in core_points])
+    for x, z in scatter(rng, terminals):
+        name = names()
+        if rng.random() < 0.3:  # some destinations are sub-stops of a town, like "albion:hmarket"
+            name = "{0}:{1}".format(name, rng.choice(["market", "docks", "north", "spawn", "arena"]))
+        nodes[name] = {"BadLinks": {}, "links": [], "name": name, "x": x, "y": 64, "z": z}
+        if rng.random() < 0.1:
+            nodes[name]["aliases"] = [names()]
+        if rng.random() < 0.02:
+            nodes[name]["advisory"] = "Destination under construction."
+        link(nodes, name, core[int(index.nearest(x, z, 1)[0][0])])
+    return nodes
+
+
+def aura_world(rng: random.Random, names: Names, count: int):
+    """AURA computed.json: junctions and crossings (plus the stations that double as junctions) forming the
+    network, lines running between some of them, and stops hanging off it, with the dest strings routes use."""
+    nodes, core, core_points = {}, [], []
+    for x, z in scatter(rng, count):
+        key = names()
+        kind = rng.choices(["stop", "junction", "crossing", "junctionstop", "stopjunction"], [50, 15, 25, 6, 4])[0]
+        node = {"type": kind, "x": x, "z": z, "links": []}
+        if kind != "crossing":
+            display = key.capitalize()
+            node["name"] = [display, display.upper()[:3]] if rng.random() < 0.3 else display
+            node["dest"] = key
+            node["station"] = True
+        if kind == "junctionstop":
+            node["dest_stop"] = key + ":exit"
+        if kind == "stopjunction":
+            node["dest"], node["dest_junction"] = "." + key, key + ":j"
+        nodes[key] = node
+        if kind != "stop":
+            core.append(key)
+            core_points.append((x, z))
+    connect(rng, nodes, core, core_points, 2)
+
+    index = PointIndex([p[0] for p in core_points], [p[1] for p in core_points])
+    for key, node in nodes.items():
+        if node["type"] == "stop":
+            link(nodes, key, core[int(index.nearest(node["x"], node["z"], 1)[0][0])])
+
+    # Lines: a few network nodes served by one line node, which has no coordinates of its own
+    for _ in range(max(1, count // 40)):
+        members = rng.sample(core, rng.randint(2, 3))
+        key = "{0}-{1}".format(names(), names())
+        nodes[key] = {"name": key.replace("-", " - ").title() + " Rail", "type": "line", "links": [],
+                      "dest_a": key + ":a", "dest_b": key + ":b"}
+        for member in members:
+            link(nodes, key, member)
+            nodes[member].setdefault("link_dests", {})[key] = "{0}:{1}".format(member, key)
+    return {"nodes": nodes, "dests": {}}
+
+
+def settlement_world(rng: random.Random, names: Names, count: int):
+    """CivMap settlements, a few of them unknown or parenthesized like the real data."""
+    nations = [names().capitalize() for _ in range(max(1, count // 20))]
+    settlements = []
+    for x, z in scatter(rng, count):
+        name = names().capitalize()
+        if rng.random() < 0.03:
+            name = "? ({0})".format(name)
+        elif rng.random() < 0.03:
+            name = "({0})".format(name)
+        nation = rng.choice(nations)
+        if rng.random() < 0.2:
+            nation += " - Formerly: " + rng.choice(nations)
+        settlements.append({"name": name, "x": x, "z": z, "nation": nation, "Zoom Visibility": rng.randint(1, 5)})
+    return settlements
+
+
+def claim_world(rng: random.Random, names: Names, count: int):
+    """CivMap claims: each a nation with one to three polygons around a center, some overlapping their neighbours."""
+    claims = []
+    for cx, cz in scatter(rng, count):
+        polygons = []
+        for _ in range(rng.choices([1, 2, 3], [70, 20, 10])[0]):
+            px, pz = cx + rng.randint(-800, 800), cz + rng.randint(-800, 800)
+            radius, sides = rng.uniform(80, 900), rng.randint(6, 60)
+            ring = []
+            for k in range(sides):
+                angle = 2 * math.pi * k / sides
+                r = radius * rng.uniform(0.6, 1.0)
+                ring.append([int(px + r * math.cos(angle)), int(pz + r * math.sin(angle))])
+            polygons.append(ring)
+        claims.append({"name": names().capitalize(), "polygon": polygons})
+    return claims
+
+
+def generate(directory: str, kani_nodes: int = 10000, aura_nodes: int = 2000, settlements: int = 5000,
+             claims: int = 2000, seed: int = 0):
+    """Writes a synthetic world to <directory>/resources/ and returns its sizes."""
+    rng = random.Random(seed)
+    names = Names(rng)
+    os.makedirs(os.path.join(directory, "resources"), exist_ok=True)
+    files = {"kani.json": kani_world(rng, names, kani_nodes), "aura.json": aura_world(rng, names, aura_nodes),
+             "settlements.json": settlement_world(rng, names, settlements),
+             "claims.json": claim_world(rng, names, claims)}
+    for filename, data in files.items():
+        with open(os.path.join(directory, "resources", filename), "w") as fp:
+            json.dump(data, fp)
+    return {"kani_nodes": kani_nodes, "aura_nodes": len(files["aura.json"]["nodes"]), "settlements": settlements,
+            "claims": claims, "claim_polygons": sum(len(c["polygon"]) for c in files["claims.json"]), "seed": seed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic MoleBot world for benchmarking.")
+    parser.add_argument("directory")
+    parser.add_argument("--kani-nodes", type=int, default=10000)
+    parser.add_argument("--aura-nodes", type=int, default=2000)
+    parser.add_argument("--settlements", type=int, default=5000)
+    parser.add_argument("--claims", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    sizes = generate(args.directory, args.kani_nodes, args.aura_nodes, args.settlements, args.claims, args.seed)
+    print(json.dumps(sizes))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,45 +1,59 @@
 import json
-import requests
 import logging
+import numpy as np
 import re
+import time
 from shapely.geometry import Point, Polygon
+from shapely.prepared import prep
+from shapely.strtree import STRtree
 from discord.ext import tasks
+from . import Metrics, Profiling
+from .DataFetch import applied, fetch_all, save_json, SETTLEMENTS_URL, CLAIMS_URL
+from .PointIndex import PointIndex
 from math import dist, atan2, degrees
-from operator import itemgetter
 
 
 @tasks.loop(hours=3)
+@Metrics.refresh
+@Profiling.refresh
 async def get_settlements():
     """Task function, which runs ~3hrs to get CivMap settlement/claims jsons from the CCMap repository"""
-    logging.info("Grabbing CivMap data files from GitHub at "
-                 "https://raw.githubusercontent.com/ccmap/data/master/")
-    r = requests.get("https://raw.githubusercontent.com/ccmap/data/master/settlements.civmap.json")
-    s = requests.get("https://raw.githubusercontent.com/ccmap/data/master/land_claims.civmap.json")
-    settlements_json = r.json().get("features")
-    claims_json = s.json().get("features")
-    with open("resources/claims.json", "w+") as fp:
-        fp.truncate(0)
-        json.dump(claims_json, fp)
-    with open("resources/settlements.json", "w+") as fp:
-        fp.truncate(0)  # clear file to reload it
-        json.dump(settlements_json, fp)
-    global settlements, claims
-    settlements = load_settlements()
-    claims = load_claims()
+    logging.info("Grabbing CivMap data files from GitHub at {0}, {1}".format(SETTLEMENTS_URL, CLAIMS_URL))
+    r, s = await fetch_all(SETTLEMENTS_URL, CLAIMS_URL)
+    global settlements, settlement_table, claims, claim_index
+    if s is not None:  # None when unchanged or unavailable
+        start = time.perf_counter()
+        claims_json = s.get("features")
+        save_json("resources/claims.json", claims_json)
+        claims = build_claims(claims_json)
+        claim_index = ClaimIndex(claims)
+        for annotate in claims_refreshed:
+            annotate()
+        applied(CLAIMS_URL, time.perf_counter() - start)
+    if r is not None:
+        start = time.perf_counter()
+        settlements = r.get("features")
+        settlement_table = SettlementTable(settlements)
+        save_json("resources/settlements.json", settlements)
+        applied(SETTLEMENTS_URL, time.perf_counter() - start)
 
 
 def load_settlements():
-    """Helper function to load settlements from the json (after loading it)"""
+    """Helper function to load settlements from the json, only used on a cold start."""
     with open("resources/settlements.json", "r") as fp:
         return json.load(fp)
 
 
-# Unlike all the other load functions, this transforms the list of features into a json with all polygons.
 def load_claims():
-    """Helper function to load claims from the json (and also load the polygons correctly)"""
-    claims = []
+    """Helper function to load claims from the json, only used on a cold start."""
     with open("resources/claims.json", "r") as fp:
-        claims_json = json.load(fp)
+        return build_claims(json.load(fp))
+
+
+# Unlike the settlements, this transforms the list of features into a json with all polygons.
+def build_claims(claims_json: list):
+    """Helper function to build the claims list (and also load the polygons correctly) from the claim features."""
+    claims = []
     for claim in claims_json:
         polygons = claim.get("polygon")
         p = [Polygon(poly) for poly in polygons]
@@ -47,42 +61,91 @@ def load_claims():
     return claims
 
 
+NATION_SUFFIX = re.compile(",.*$")
+DIRECTIONS = ["N", "NNW", "NW", "WNW", "W", "WSW", "SW", "SSW", "S", "SSE", "SE", "ESE", "E", "ENE", "NE", "NNE", "N"]
+
+
+class SettlementTable:
+    """Settlements that /whereis can show (not unknown or parenthesized), flattened into parallel lists with the
+    nation already cleaned up, plus a PointIndex over their coordinates. Rebuilt whenever settlements refresh."""
+    __slots__ = ("names", "nations", "major", "x", "z", "index")
+
+    def __init__(self, settlements: list):
+        entries = [e for e in settlements if '?' not in e.get("name") and e.get("name")[0] != '(']
+        self.names = [e.get("name") for e in entries]
+        self.nations = [NATION_SUFFIX.sub("", e.get("nation", "")) for e in entries]
+        self.major = np.array([e.get("Zoom Visibility") <= 2 for e in entries], dtype=bool)
+        self.x = [e["x"] for e in entries]
+        self.z = [e["z"] for e in entries]
+        self.index = PointIndex(self.x, self.z)
+
+
+class ClaimIndex:
+    """Every claim polygon flattened into one list (in claim order, then polygon order), prepared for fast
+    containment tests and put in an STRtree so a lookup only tests the polygons whose bounding box holds the point.
+    Rebuilt whenever claims refresh."""
+    __slots__ = ("names", "polygons", "prepared", "tree", "ids", "bounds")
+
+    def __init__(self, claims: list):
+        self.names, self.polygons = [], []
+        for c in claims:
+            for poly in c.get("claim"):
+                self.names.append(c.get("name"))
+                self.polygons.append(poly)
+        self.prepared = [prep(poly) for poly in self.polygons]
+        self.tree = STRtree(self.polygons)
+        self.ids = {id(poly): i for i, poly in enumerate(self.polygons)}
+        self.bounds = np.array([poly.bounds for poly in self.polygons], dtype=np.float64).reshape(-1, 4)
+
+    def candidates(self, point: Point):
+        """Returns the indices of the polygons whose bounding box contains the point, in order."""
+        hits = self.tree.query(point)
+        if len(hits) != 0 and not isinstance(hits[0], (int, np.integer)):  # Shapely 1.x returns the geometries
+            hits = [self.ids[id(geom)] for geom in hits]
+        return sorted(int(i) for i in hits)
+
+    def containing(self, xs, zs, chunk=1024):
+        """Batch version of find_containing_poly: returns the containing claim name (or "") for every point.
+        Bounding boxes are checked for a whole chunk of points against every polygon at once, and only the
+        remaining pairs are tested exactly, in the same first-match order as a single lookup."""
+        xs, zs = np.asarray(xs, dtype=np.float64), np.asarray(zs, dtype=np.float64)
+        names = [""] * len(xs)
+        for start in range(0, len(xs), chunk):
+            px, pz = xs[start:start + chunk, None], zs[start:start + chunk, None]
+            inside = (px >= self.bounds[:, 0]) & (pz >= self.bounds[:, 1]) & \
+                     (px <= self.bounds[:, 2]) & (pz <= self.bounds[:, 3])
+            done = set()
+            for p, i in zip(*np.nonzero(inside)):  # ordered by point, then polygon
+                if p in done:
+                    continue
+                if self.prepared[i].contains(Point(px[p, 0], pz[p, 0])):
+                    names[start + p] = self.names[i]
+                    done.add(p)
+        return names
+
+
 settlements = load_settlements()
 claims = load_claims()  # structure: [{name: str, claim: polygon}]
+claim_index = ClaimIndex(claims)
+settlement_table = SettlementTable(settlements)
+claims_refreshed = []  # callbacks that re-annotate other datasets (ie. rail stops) after the claims change
 
 
 def find_closest(x: int, z: int):
     """Finds the closest ten settlements from a given location."""
     # TODO: Ensure there is at least one major settlement in the return statement!
-    distances = {}
-    for entry in settlements:
-        name = entry.get("name")
-        if '?' not in name and name[0] != '(':
-            distance = dist([x, z], [entry["x"], entry["z"]])
-            distances[name] = distance
-
-    closest = list({k: v for k, v in sorted(distances.items(), key=lambda item: item[1])})[:10]
+    table = settlement_table
     closest_settlements = []
 
-    for i in range(10):
-        index = list(map(itemgetter('name'), settlements)).index(list(closest)[i])
-        sett = settlements[index]
-
-        nation = sett.get("nation", "")
-        nation = re.sub(pattern="\,.*$", repl="", string=nation)
-        distance = distances[sett.get('name')]
+    for i in table.index.nearest(x, z, 10)[0].tolist():
+        sett_x, sett_z = table.x[i], table.z[i]
+        distance = dist([x, z], [sett_x, sett_z])
 
-        angle = degrees(atan2(sett["z"] - z, sett["x"] - x)) + 90
+        angle = degrees(atan2(sett_z - z, sett_x - x)) + 90
         angle = angle if angle >= 0 else angle + 360
-        x, z = sett["x"], sett["z"]
-
-        directions = ["N", "NNW", "NW", "WNW", "W", "WSW", "SW", "SSW", "S", "SSE", "SE", "ESE",
-                      "E", "ENE", "NE", "NNE", "N"]
 
-        direc = int(angle // 22.5)
-        major = True if sett.get("Zoom Visibility") <= 2 else False
-        info = {"name": sett.get('name'), "distance": distance,
-                "direction": directions[direc], "major": major, "x": x, "z": z, "nation": nation}
+        info = {"name": table.names[i], "distance": distance, "direction": DIRECTIONS[int(angle // 22.5)],
+                "major": bool(table.major[i]), "x": sett_x, "z": sett_z, "nation": table.nations[i]}
         closest_settlements.append(info)
 
     return closest_settlements
@@ -91,17 +154,21 @@ def find_closest(x: int, z: int):
 # CivMap, while not completely susceptible to overlapping claims,
 # is generally pretty good about maintaining claims polygons.
 def find_containing_poly(x: int, z: int):
-    """This function finds whether the polygon contains a point given in here."""
-    global claims
-    for c in claims:
-        polys = c.get("claim")
-        point = Point(x, z)
-        for poly in polys:
-            if poly.contains(point):
-                return c.get("name")
+    """This function finds whether the polygon contains a point given in here. Where claims overlap, the first
+    claim (and polygon) in the claims list wins."""
+    index = claim_index
+    point = Point(x, z)
+    for i in index.candidates(point):
+        if index.prepared[i].contains(point):
+            return index.names[i]
     return ""
 
 
+def locate(x: int, z: int):
+    """Everything /whereis needs for a point: the closest settlements and the claim containing it."""
+    return find_closest(x, z), find_containing_poly(x, z)
+
+
 # TODO for next release: /civmap [name] to get a structure and basic info (if it exists)
 
 
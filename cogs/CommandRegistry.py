@@ -0,0 +1,70 @@
+import logging
+from discord import Embed
+
+ABOUT = ("I'm a bot created by specificlanguage created to do simple Civ tasks, like finding rail /dest commands or "
+         "finding the closest place to a point; but of course I also create moles as well. Use `/` for all commands!")
+ISSUES = "For any bugs, please make an issue at the GitHub at https://github.com/specificlanguage/MoleBot"
+SYNC_COMPARED = {"name", "description", "type", "required", "choices", "options"}  # what model.OptionData keeps
+
+
+class CommandRegistry:
+    """The bot's slash commands and their /help embeds, rendered once from the commands registered with
+    SlashCommand (in the same form Discord's API lists them) and rebuilt whenever the commands are synced (at
+    startup and on extension reloads), so /help is answered from memory."""
+    __slots__ = ("commands", "overview", "embeds")
+
+    def __init__(self, commands: list = ()):
+        self.build(commands)
+
+    def build(self, commands: list):
+        """Renders the overview embed and one embed per command, from a list of command dicts."""
+        self.commands = sorted(commands, key=lambda cmd: cmd["name"])
+        self.embeds = {}
+        for cmd in self.commands:
+            embed = Embed(title="/" + cmd["name"], description=cmd.get("description"))
+            options = ["`{0}` - {1}".format(option["name"], option["description"]) for option in cmd.get("options", [])]
+            if len(options) != 0:
+                embed.add_field(name="Options", value="\n".join(options))
+            self.embeds[cmd["name"]] = embed
+
+        self.overview = Embed(title="Hi, I'm MoleBot!", description=ABOUT,
+                              url="https://c.tenor.com/z8JgskMjeuAAAAAC/yes-monty-mole.gif")
+        listing = "\n".join("`{0}` - {1}".format(cmd["name"], cmd.get("description")) for cmd in self.commands)
+        self.overview.add_field(name="Commands:", value=listing or "None yet, try again in a moment!", inline=True)
+        self.overview.add_field(name="Issues?", value=ISSUES, inline=False)
+
+    def embed(self, command: str):
+        """Returns the /help embed for a command name, or None if there is no such command."""
+        return self.embeds.get(command)
+
+    def __len__(self):
+        return len(self.commands)
+
+
+def option_extras(options: list):
+    """The parts of a command's options that discord_slash's sync doesn't compare (ie. `autocomplete`), by option
+    name and nested for subcommands. Unset and false values are left out, as Discord leaves them out of the
+    commands it lists."""
+    return {option["name"]: ({key: value for key, value in option.items() if key not in SYNC_COMPARED and value},
+                             option_extras(option.get("options") or []))
+            for option in options or []}
+
+
+async def sync_options(slash):
+    """discord_slash 2.4 only registers a command again if it changed as far as model.OptionData can tell, which
+    drops the option keys it doesn't know about, so a command that only gained (or lost) `autocomplete` would never
+    be sent to Discord. Registers the commands of every scope where that happened in full; run before the regular
+    sync, which then finds nothing left to change."""
+    commands = await slash.to_dict()
+    for scope, scope_commands in [(None, commands["global"])] + list(commands["guild"].items()):
+        registered = {cmd["name"]: cmd for cmd in await slash.req.get_all_commands(guild_id=scope)}
+        changed = [cmd["name"] for cmd in scope_commands if cmd["name"] in registered and
+                   option_extras(cmd["options"]) != option_extras(registered[cmd["name"]].get("options"))]
+        if len(changed) == 0:
+            continue
+        logging.info("Registering {0} again for changed options ({1})"
+                     .format("global commands" if scope is None else "commands in {0}".format(scope),
+                             ", ".join(changed)))
+        await slash.req.put_slash_commands(
+            slash_commands=[{key: value for key, value in cmd.items() if key != "permissions"}
+                            for cmd in scope_commands], guild_id=scope)
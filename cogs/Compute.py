@@ -0,0 +1,60 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from . import Metrics, Profiling
+
+# Routing and geometry for slash commands run on these threads instead of the event loop. Threads rather than
+# processes, since the work reads the graphs and indexes the refresh tasks swap in, which every thread sees as
+# soon as they are rebound; pure Python work still shares the GIL, but only in short slices, so the loop keeps
+# answering other interactions while a slow route runs.
+WORKERS = int(os.environ.get("compute_workers", 2))
+QUEUE_SIZE = int(os.environ.get("compute_queue", 64))  # jobs allowed to wait for a free worker
+BUSY = "MoleBot is handling a lot of requests right now, please try again in a moment!"  # reply to ComputeBusy
+COMPUTE_STATS = {"completed": 0, "rejected": 0, "pending": 0, "peak": 0, "max_wait": 0.0, "max_run": 0.0}
+
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="compute")
+Metrics.watch("compute_pending", lambda: COMPUTE_STATS["pending"])
+Metrics.watch("compute_rejected", lambda: COMPUTE_STATS["rejected"])
+
+
+class ComputeBusy(Exception):
+    """Raised by run when every worker is busy and the queue is full."""
+
+
+async def run(function, *args):
+    """Runs `function(*args)` on a compute thread and returns its result. Raises ComputeBusy straight away if
+    WORKERS + QUEUE_SIZE jobs are already pending, so a burst of commands fails fast instead of piling up past
+    Discord's reply deadline."""
+    if COMPUTE_STATS["pending"] >= WORKERS + QUEUE_SIZE:
+        COMPUTE_STATS["rejected"] += 1
+        logging.warning("Compute queue full ({0} pending), rejected {1}"
+                        .format(COMPUTE_STATS["pending"], function.__name__))
+        raise ComputeBusy()
+
+    COMPUTE_STATS["pending"] += 1
+    COMPUTE_STATS["peak"] = max(COMPUTE_STATS["peak"], COMPUTE_STATS["pending"])
+    submitted = time.perf_counter()
+    started = []
+    sample = Profiling.current()  # the compute thread profiles its part of a sampled command itself
+
+    def job():
+        started.append(time.perf_counter())
+        if sample is not None:
+            return sample.call(function, *args)
+        return function(*args)
+
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, job)
+    finally:
+        COMPUTE_STATS["pending"] -= 1
+        COMPUTE_STATS["completed"] += 1
+        if len(started) != 0:
+            COMPUTE_STATS["max_wait"] = max(COMPUTE_STATS["max_wait"], started[0] - submitted)
+            COMPUTE_STATS["max_run"] = max(COMPUTE_STATS["max_run"], time.perf_counter() - started[0])
+
+
+def shutdown():
+    """Stops the compute threads, run when the bot shuts down."""
+    _executor.shutdown(wait=False)
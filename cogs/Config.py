@@ -0,0 +1,70 @@
+import discord
+from discord.ext import commands
+from discord_slash import SlashContext, cog_ext
+from .Settings import change_mole, get_settings, get_wiki_setting, set_wiki_setting
+
+
+class Config(commands.Cog, name="Settings"):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @cog_ext.cog_slash(name="disablemole", description="Disable or reenables the mole guy :(")
+    async def disablemole(self, ctx: SlashContext, **setting: bool):
+        """Command handler for /disablemole, superceded task to 'modify_mole'"""
+        await modify_mole(ctx)
+
+    @cog_ext.cog_slash(name="config", description="Show/select settings")
+    async def config(self, ctx: SlashContext):
+        """Top-level command for config commands"""
+        settings = await get_settings(ctx.guild.id)
+        embed = discord.Embed(title="Current settings:", description="`/mole`: {0}\n`/wiki` output: {1}"
+                              .format(str(settings["mole"]), str(settings["wiki"])))
+        embed.set_footer(text="To change settings, do `/config mole` or `/config wiki`.")
+        await ctx.send(embed=embed)
+
+
+    @cog_ext.cog_subcommand(base="config", name="mole", description="Change /mole behavior")
+    async def config_mole(self, ctx: SlashContext):
+        """Command handler for mole subcommand of config, superceded task to 'modify_mole_'."""
+        await modify_mole(ctx)
+
+    @cog_ext.cog_subcommand(base="config", name="wiki", description="Change CivWiki query behavior")
+    async def config_wiki(self, ctx: SlashContext):
+        """Command handler for CivWiki subcommand of config, calls subroutines to set wiki value.
+           Either disables or enables [[wiki querying]] in this subcommand, but does not disable /civwiki."""
+        if ctx.guild is None:
+            await ctx.send("This can only be run in a discord.")
+        if ctx.author.guild_permissions.administrator or ctx.author.guild_permissions.manage_messages:
+            setting = not await get_wiki_setting(ctx.guild.id)
+            new_setting = await set_wiki_setting(server_id=ctx.guild.id, setting=setting)
+            if new_setting:
+                await ctx.send("Enabled [[ wiki querying ]] on this server. Do `/config wiki {setting}` to change it \
+                (`setting` is optional). You can also do `/civwiki` to query CivWiki anyway.")
+            else:
+                await ctx.send("Disabled [[ wiki querying ]] on this server. Do `/config wiki {setting}` to change it \
+                (`setting` is optional). You can also do `/civwiki` to query CivWiki anyway.")
+        else:  # Admins only
+            await ctx.send("Only users with administrator or manage messages permissions can use this command.",
+                           hidden=True)
+
+
+async def modify_mole(ctx: SlashContext):
+    """General handler for mole subcommand of config, calls subroutines to set mole value.
+    Either disables or enables /mole in this subcommand."""
+    if ctx.guild is None:
+        await ctx.send("This can only be run in a discord.")
+    if ctx.author.guild_permissions.administrator or ctx.author.guild_permissions.manage_messages:
+        setting = await change_mole(ctx.guild_id)
+        if setting:
+            await ctx.send("Enabled `/mole` on this server. Do `/disablemole` again to disable it."
+                           .format(ctx.guild.name))
+        else:  # Now set to false
+            await ctx.send("Disabled `/mole` on this server. Do `/disablemole` again to enable it."
+                           .format(ctx.guild.name))
+    else:  # Admins only
+        await ctx.send("Only users with administrator or manage messages permissions can use this command.",
+                       hidden=True)
+
+
+def setup(bot):
+    bot.add_cog(Config(bot))
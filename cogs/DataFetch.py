@@ -0,0 +1,146 @@
+import aiohttp
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from . import Metrics
+
+# Everything MoleBot downloads lives on raw.githubusercontent.com; `raw_url` can point elsewhere (ie. a local
+# stand-in serving the same paths) for testing.
+RAW_URL = os.environ.get("raw_url", "https://raw.githubusercontent.com").rstrip("/")
+KANI_URL = RAW_URL + "/Ameliorate/KANI/master/docs/export.json"
+AURA_URL = RAW_URL + "/auracc/aura-toml/main/computed.json"
+SETTLEMENTS_URL = RAW_URL + "/ccmap/data/master/settlements.civmap.json"
+CLAIMS_URL = RAW_URL + "/ccmap/data/master/land_claims.civmap.json"
+
+TIMEOUT = aiohttp.ClientTimeout(total=60, connect=10)
+RETRIES = 3
+BACKOFF = 2.0  # seconds, doubled after every failed attempt
+
+_session = None
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="persist")  # one thread, so writes stay in order
+
+
+def get_session():
+    """Returns the shared aiohttp session, creating it on first use. Must be called from within the event loop."""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(timeout=TIMEOUT, connector=aiohttp.TCPConnector(limit=8),
+                                         raise_for_status=True)
+    return _session
+
+
+async def close_session():
+    """Closes the shared session, run when the bot shuts down."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+class Source:
+    """What we know about the last applied version of a download: its HTTP validators, a hash of the body, and
+    how long rebuilding from it took. A fetched but not yet applied version waits in `pending`."""
+    __slots__ = ("etag", "last_modified", "digest", "rebuild_time", "pending")
+
+    def __init__(self):
+        self.etag = None
+        self.last_modified = None
+        self.digest = None
+        self.rebuild_time = 0.0
+        self.pending = None
+
+
+sources = {}  # url -> Source
+
+
+async def fetch_json(url: str):
+    """Downloads a JSON file with the shared session, retrying with exponential backoff on errors and timeouts.
+    Sends a conditional request using the validators of the last applied version, and returns None without
+    parsing when the server answers 304 or the body hashes the same as before. Otherwise the body is parsed in
+    the default executor so large files don't hold up the event loop."""
+    loop = asyncio.get_running_loop()
+    source = sources.setdefault(url, Source())
+    headers = {}
+    if source.etag is not None:
+        headers["If-None-Match"] = source.etag
+    if source.last_modified is not None:
+        headers["If-Modified-Since"] = source.last_modified
+
+    for attempt in range(RETRIES):
+        try:
+            async with get_session().get(url, headers=headers) as r:
+                body = await r.read()
+                status, etag, last_modified = r.status, r.headers.get("ETag"), r.headers.get("Last-Modified")
+            if status == 304:
+                Metrics.FETCHES.labels(url, "not_modified").inc()
+                logging.info("{0} not modified (0 bytes), skipped rebuild (saves ~{1:.2f}s)"
+                             .format(url, source.rebuild_time))
+                return None
+            digest = hashlib.sha256(body).hexdigest()
+            if digest == source.digest:
+                source.etag, source.last_modified = etag, last_modified
+                Metrics.FETCHES.labels(url, "unchanged").inc()
+                logging.info("{0} unchanged ({1} bytes), skipped rebuild (saves ~{2:.2f}s)"
+                             .format(url, len(body), source.rebuild_time))
+                return None
+            logging.info("{0} changed ({1} bytes)".format(url, len(body)))
+            Metrics.FETCHES.labels(url, "changed").inc()
+            source.pending = (etag, last_modified, digest)
+            return await loop.run_in_executor(None, json.loads, body)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            if attempt == RETRIES - 1:
+                raise
+            delay = BACKOFF * 2 ** attempt
+            logging.warning("Failed to fetch {0} ({1}), retrying in {2}s".format(url, e, delay))
+            await asyncio.sleep(delay)
+
+
+def applied(url: str, rebuild_time: float):
+    """Marks the last fetched version of a download as applied, so later refreshes can skip it while it stays
+    the same. Called by the refresh tasks once they have rebuilt from it, with how long that took."""
+    source = sources.setdefault(url, Source())
+    if source.pending is not None:
+        source.etag, source.last_modified, source.digest = source.pending
+        source.pending = None
+    source.rebuild_time = rebuild_time
+
+
+async def fetch_all(*urls: str):
+    """Downloads several JSON files concurrently. Returns the results in order; a download that is unchanged
+    since it was last applied, or that still fails after retrying, is returned as None and should be skipped."""
+    results = await asyncio.gather(*[fetch_json(url) for url in urls], return_exceptions=True)
+    for url, result in zip(urls, results):
+        if isinstance(result, Exception):
+            Metrics.FETCHES.labels(url, "failed").inc()
+            logging.error("Could not fetch {0}: {1}".format(url, result))
+    return [None if isinstance(result, Exception) else result for result in results]
+
+
+def _write_json(path: str, data):
+    """Writes JSON to a temporary file next to `path` and renames it over `path`, so the file is always either the
+    old or the new version, never a partial one."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as fp:
+            json.dump(data, fp)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.chmod(tmp, 0o644)  # mkstemp creates the file as owner-only
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def save_json(path: str, data):
+    """Persists downloaded data to `path` in a background thread. The files in resources/ are only read again on
+    a cold start, so nothing waits for this; failures are logged."""
+    def done(future):
+        if future.exception() is not None:
+            logging.error("Could not save {0}: {1}".format(path, future.exception()))
+
+    _writer.submit(_write_json, path, data).add_done_callback(done)
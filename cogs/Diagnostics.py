@@ -0,0 +1,40 @@
+import logging
+from discord.ext import commands
+from discord_slash import SlashContext, cog_ext
+from discord_slash.utils.manage_commands import create_option
+from .Profiling import PROFILE_STATS, set_every
+from .Settings import pool_stats
+
+
+class Diagnostics(commands.Cog, name="Diagnostics"):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @cog_ext.cog_slash(name="profile", description="Show or change command profiling (bot owner only)",
+                       options=[create_option(name="every", description="Profile one in this many runs (0 is off)",
+                                              option_type=4, required=False)])
+    async def profile(self, ctx: SlashContext, every: int = None):
+        """Command handler for /profile, which shows the sampling state and database pool stats, or sets how often
+        runs are sampled."""
+        if not await self.bot.is_owner(ctx.author):
+            await ctx.send("Only the bot owner can use this command.", hidden=True)
+            return
+        if every is not None:
+            set_every(every)
+            logging.info("Profiling set to one in {0} runs by {1}".format(PROFILE_STATS["every"], ctx.author))
+        state = "off" if PROFILE_STATS["every"] == 0 else "one in {0} runs".format(PROFILE_STATS["every"])
+        lines = ["Profiling is {0}. {1} runs sampled ({2} skipped while another was running), last: `{3}`"
+                 .format(state, PROFILE_STATS["sampled"], PROFILE_STATS["skipped"], PROFILE_STATS["last"])]
+        pool = pool_stats()
+        lines.append("Database pool: {0}/{1} connections in use (peak {2}), {3} acquired after waiting {4:.1f}ms "
+                     "in total, {5:.1f}ms at most".format(pool["in_use"], pool["max_size"], pool["peak"],
+                                                         pool["acquires"], pool["waited"] * 1000,
+                                                         pool["max_wait"] * 1000))
+        for name, stats in sorted(pool["queries"].items()):
+            lines.append("`{0}`: {1} runs, {2:.1f}ms mean, {3:.1f}ms max"
+                         .format(name, stats["count"], stats["mean"] * 1000, stats["max"] * 1000))
+        await ctx.send("\n".join(lines), hidden=True)
+
+
+def setup(bot):
+    bot.add_cog(Diagnostics(bot))
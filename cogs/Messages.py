@@ -0,0 +1,93 @@
+import logging
+import re
+from discord.ext import commands
+from string import whitespace
+from . import Metrics
+from .Settings import get_settings
+
+WIKI_PATTERN = re.compile(r"\[{2}([^\]\n]+) *\]{2}")
+WIKI_URL = "https://civwiki.org/wiki/"
+WIKI_PAGES = 5  # most pages linked from one message
+
+
+class Matcher:
+    """Something MoleBot answers in ordinary messages. `find(content)` is only called on messages containing
+    `needle`, which is a plain substring test and rules out almost every message straight away; it returns what
+    `respond(message, found, settings)` needs, or None if the message isn't a match after all."""
+    __slots__ = ("name", "needle", "find", "respond")
+
+    def __init__(self, name: str, needle: str, find, respond):
+        self.name = name
+        self.needle = needle
+        self.find = find
+        self.respond = respond
+
+
+def find_wiki_pages(content: str):
+    """Returns the [[page names]] in a message, or None if it has none."""
+    pages = [page for page in WIKI_PATTERN.findall(content) if page not in whitespace]
+    return pages or None
+
+
+async def link_wiki_pages(message, pages: list, settings: dict):
+    """Replies with CivWiki links to the pages a message asked for, if the server has wiki querying on."""
+    if not settings["wiki"]:
+        return
+    logging.info("Someone looked up {0} on CivWiki in {1} ({2})"
+                 .format(", ".join(pages[:WIKI_PAGES]), message.guild.name, message.guild.id))
+    page_list = "\n".join(WIKI_URL + page.replace(" ", "_") for page in pages[:WIKI_PAGES])
+    if len(pages) == 1:
+        page_list = page_list.replace("<", "").replace(">", "")
+    await message.reply(page_list, mention_author=False)
+
+
+def find_delusional(content: str):
+    """Returns True for a message calling something delusional, or None if it also has a [[wiki link]] in it."""
+    if "[[" in content:
+        return None
+    return True
+
+
+async def edit_civwiki(message, found: bool, settings: dict):
+    """Tells the channel to edit CivWiki, on servers where wiki querying is off (where it is on, the message
+    gets a wiki link instead)."""
+    if not settings["wiki"]:
+        await message.channel.send("**Edit CivWiki:** https://civwiki.org")
+
+
+MATCHERS = [Matcher("wiki", "[[", find_wiki_pages, link_wiki_pages),
+            Matcher("delusional", "delusional", find_delusional, edit_civwiki)]
+
+
+async def dispatch(message):
+    """Runs every matcher that fires on a message. Messages from bots and outside servers are ignored, and the
+    server's settings are only looked up (once) when some matcher has fired."""
+    if message.author.bot or message.guild is None:
+        return
+    content = message.content
+    fired = []
+    for matcher in MATCHERS:
+        if matcher.needle in content:
+            found = matcher.find(content)
+            if found is not None:
+                fired.append((matcher, found))
+    if len(fired) == 0:
+        return
+    settings = await get_settings(message.guild.id)
+    for matcher, found in fired:
+        await matcher.respond(message, found, settings)
+
+
+class Messages(commands.Cog, name="Messages"):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @commands.Cog.listener()
+    @Metrics.listener
+    async def on_message(self, message):
+        """discord.py listener for every message, handed to the matchers."""
+        await dispatch(message)
+
+
+def setup(bot):
+    bot.add_cog(Messages(bot))
@@ -0,0 +1,93 @@
+import functools
+import logging
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+# Prometheus metrics for MoleBot, served on a local HTTP endpoint for a scraper on the same host.
+METRICS_ADDR = os.environ.get("metrics_addr", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("metrics_port", 9108))  # 0 turns the endpoint off
+REFRESH_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+COMMAND_SECONDS = Histogram("molebot_command_seconds", "Slash command latency, from dispatch to return",
+                            ["command", "guilds"])
+COMMAND_ERRORS = Counter("molebot_command_errors", "Slash commands that raised", ["command", "guilds"])
+LISTENER_SECONDS = Histogram("molebot_listener_seconds", "Event listener latency", ["listener"])
+LISTENER_ERRORS = Counter("molebot_listener_errors", "Event listeners that raised", ["listener"])
+REFRESH_SECONDS = Histogram("molebot_refresh_seconds", "Data refresh task latency, downloads included", ["task"],
+                            buckets=REFRESH_BUCKETS)
+REFRESH_ERRORS = Counter("molebot_refresh_errors", "Data refresh tasks that raised", ["task"])
+FETCHES = Counter("molebot_fetches", "Data downloads by outcome: changed, not_modified, unchanged or failed",
+                  ["url", "result"])
+QUERY_SECONDS = Histogram("molebot_query_seconds", "Settings query latency, once a connection is acquired",
+                          ["query"])
+QUERY_ERRORS = Counter("molebot_query_errors", "Settings queries that raised", ["query"])
+POOL_WAIT_SECONDS = Histogram("molebot_pool_wait_seconds", "Time spent waiting for a database connection")
+CACHE_LOOKUPS = Counter("molebot_cache_lookups", "Cache lookups by result (hit or miss)", ["cache", "result"])
+CACHE_HIT_RATIO = Gauge("molebot_cache_hit_ratio", "Share of cache lookups that hit since startup", ["cache"])
+STATE = Gauge("molebot_state", "Point-in-time values read when scraped (ie. pending compute jobs)", ["name"])
+
+_lookups = {}  # cache -> [hits, misses], for the hit ratio gauges
+
+
+def guild_bucket(count: int):
+    """Groups the bot's guild count by order of magnitude, so it can label metrics without growing their
+    cardinality with every server that joins."""
+    if count == 0:
+        return "0"
+    low = 10 ** (len(str(count)) - 1)
+    return "{0}-{1}".format(low, low * 10 - 1)
+
+
+@contextmanager
+def timed(histogram: Histogram, errors: Counter, *labels):
+    """Observes how long the block took on `histogram`, and counts it on `errors` if it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        errors.labels(*labels).inc()
+        raise
+    finally:
+        histogram.labels(*labels).observe(time.perf_counter() - start)
+
+
+def instrument(histogram: Histogram, errors: Counter):
+    """Decorator for coroutines timed by `histogram` and `errors`, labelled with the coroutine's name."""
+    def decorator(function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            with timed(histogram, errors, function.__name__):
+                return await function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+listener = instrument(LISTENER_SECONDS, LISTENER_ERRORS)  # goes under @bot.event / @commands.Cog.listener()
+refresh = instrument(REFRESH_SECONDS, REFRESH_ERRORS)  # goes under @tasks.loop()
+
+
+def cache(name: str, hit: bool):
+    """Records a lookup in the named cache."""
+    CACHE_LOOKUPS.labels(name, "hit" if hit else "miss").inc()
+    if name not in _lookups:
+        _lookups[name] = [0, 0]
+        CACHE_HIT_RATIO.labels(name).set_function(lambda: _lookups[name][0] / max(1, sum(_lookups[name])))
+    _lookups[name][0 if hit else 1] += 1
+
+
+def watch(name: str, function):
+    """Exposes `function()` as a STATE value, read every time the endpoint is scraped."""
+    STATE.labels(name).set_function(function)
+
+
+def serve():
+    """Starts the metrics endpoint on a background thread, run once when the bot starts."""
+    if METRICS_PORT == 0:
+        return
+    try:
+        start_http_server(METRICS_PORT, addr=METRICS_ADDR)
+        logging.info("Serving metrics on http://{0}:{1}/metrics".format(METRICS_ADDR, METRICS_PORT))
+    except OSError as e:
+        logging.error("Could not serve metrics on {0}:{1}: {2}".format(METRICS_ADDR, METRICS_PORT, e))
@@ -0,0 +1,81 @@
+import aiohttp
+import asyncio
+import logging
+import os
+from .DataFetch import get_session
+from .TTLCache import TTLCache
+
+# Player profiles for /whois: Mojang's username -> UUID and name history endpoints, and whether the player has a
+# CivWiki page. `mojang_url` and `civwiki_url` can point at a local stand-in serving the same paths, for testing.
+MOJANG_URL = os.environ.get("mojang_url", "https://api.mojang.com").rstrip("/")
+CIVWIKI_URL = os.environ.get("civwiki_url", "https://civwiki.org").rstrip("/")
+TIMEOUT = aiohttp.ClientTimeout(total=5)
+NOT_FOUND = (204, 404)  # what Mojang answers for unused names and UUIDs without a history
+
+UUIDS = TTLCache("uuid", ttl=3600)  # lowercased username -> UUID, or "" for unused names
+HISTORIES = TTLCache("name_history", ttl=6 * 3600)  # UUID -> name history, which rarely changes
+WIKI_PAGES = TTLCache("wiki_page", ttl=3600)  # page name -> whether the page exists
+
+
+def wiki_url(page_name: str):
+    return CIVWIKI_URL + "/wiki/" + page_name.replace(" ", "_")
+
+
+async def fetch_uuid(username: str):
+    """Asks Mojang for the UUID of a username, returning "" if no one has it. Any other failure (rate limits,
+    server errors) raises, so it isn't cached as an unused name."""
+    url = "{0}/users/profiles/minecraft/{1}".format(MOJANG_URL, username)
+    async with get_session().get(url, timeout=TIMEOUT, raise_for_status=False) as r:
+        if r.status in NOT_FOUND:
+            return ""
+        r.raise_for_status()
+        return (await r.json(content_type=None)).get("id", "")
+
+
+async def fetch_name_history(uuid: str):
+    """Asks Mojang for the names a UUID has had, oldest first, or an empty list if it has none to give. Other
+    failures raise, like in fetch_uuid."""
+    url = "{0}/user/profiles/{1}/names".format(MOJANG_URL, uuid)
+    async with get_session().get(url, timeout=TIMEOUT, raise_for_status=False) as r:
+        if r.status in NOT_FOUND:
+            return []
+        r.raise_for_status()
+        return await r.json(content_type=None)
+
+
+async def fetch_wiki_page(page_name: str):
+    """Checks whether a CivWiki page exists with a HEAD request. Server errors raise, so they aren't cached as a
+    missing page."""
+    async with get_session().head(wiki_url(page_name), timeout=TIMEOUT, raise_for_status=False) as r:
+        if r.status >= 500:
+            r.raise_for_status()
+        return r.status == 200
+
+
+async def get_uuid(username: str):
+    return await UUIDS.get(username.lower(), fetch_uuid, username)
+
+
+async def get_name_history(uuid: str):
+    return await HISTORIES.get(uuid, fetch_name_history, uuid)
+
+
+async def get_civwiki_page(page_name: str):
+    """Returns (url, exists) for a CivWiki page. The page is only a nice extra on /whois, so if the wiki can't be
+    reached it is reported as missing (and not cached) rather than failing the lookup."""
+    try:
+        return wiki_url(page_name), await WIKI_PAGES.get(page_name, fetch_wiki_page, page_name)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logging.warning("Could not check CivWiki page {0}: {1}".format(page_name, e))
+        return wiki_url(page_name), False
+
+
+async def lookup(username: str):
+    """Returns (uuid, name history, (wiki url, exists)) for a player, or None if the username is unused. Once the
+    UUID is known, the name history and the wiki page are looked up concurrently. Raises aiohttp.ClientError or
+    asyncio.TimeoutError if Mojang can't be reached."""
+    uuid = await get_uuid(username)
+    if uuid == "":
+        return None
+    history, wiki = await asyncio.gather(get_name_history(uuid), get_civwiki_page(username))
+    return uuid, history, wiki
@@ -0,0 +1,68 @@
+import numpy as np
+from math import floor, sqrt
+
+
+class PointIndex:
+    """Uniform grid index over a fixed set of 2D map points, for k-nearest queries. Points are bucketed into square
+    cells (about two points per cell) and stored sorted by cell, so each row of cells is a contiguous slice of
+    `order`; a query scans rings of cells outward from its own cell until nothing further out can be closer."""
+    __slots__ = ("x", "z", "cell", "min_x", "min_z", "cols", "rows", "starts", "order")
+
+    def __init__(self, x, z):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.z = np.asarray(z, dtype=np.float64)
+        n = len(self.x)
+        self.min_x = float(self.x.min()) if n else 0.0
+        self.min_z = float(self.z.min()) if n else 0.0
+        span_x = float(self.x.max()) - self.min_x if n else 0.0
+        span_z = float(self.z.max()) - self.min_z if n else 0.0
+        self.cell = max(sqrt(max(span_x * span_z, 1.0) / max(n / 2, 1)), 1.0)
+        self.cols = int(span_x // self.cell) + 1
+        self.rows = int(span_z // self.cell) + 1
+
+        cells = ((self.z - self.min_z) // self.cell).astype(np.int64) * self.cols + \
+            ((self.x - self.min_x) // self.cell).astype(np.int64)
+        self.order = np.argsort(cells, kind="stable")
+        self.starts = np.searchsorted(cells[self.order], np.arange(self.cols * self.rows + 1))
+
+    def __len__(self):
+        return len(self.x)
+
+    def _ring(self, cx: int, cz: int, r: int):
+        """Yields slices of `order` covering the cells exactly `r` cells (chebyshev) away from cell (cx, cz)."""
+        i0, i1 = max(cx - r, 0), min(cx + r, self.cols - 1)
+        for j in range(max(cz - r, 0), min(cz + r, self.rows - 1) + 1):
+            if j == cz - r or j == cz + r:
+                if i0 <= i1:
+                    yield self.order[self.starts[j * self.cols + i0]:self.starts[j * self.cols + i1 + 1]]
+            else:
+                for i in (cx - r, cx + r):
+                    if 0 <= i < self.cols:
+                        yield self.order[self.starts[j * self.cols + i]:self.starts[j * self.cols + i + 1]]
+
+    def nearest(self, x: float, z: float, k: int):
+        """Returns (indices, squared distances) of the `k` points closest to (x, z), closest first. Points at the
+        same distance are ordered by index, like a stable sort over the original list would."""
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        cx, cz = floor((x - self.min_x) / self.cell), floor((z - self.min_z) / self.cell)
+        # Rings closer than this one are entirely outside the grid
+        r = max(0, -cx, cx - self.cols + 1, -cz, cz - self.rows + 1)
+        r_max = max(cx, self.cols - 1 - cx, cz, self.rows - 1 - cz)
+        found, count = [], 0
+        while True:
+            for ids in self._ring(cx, cz, r):
+                found.append(ids)
+                count += len(ids)
+            if count >= k:
+                candidates = np.concatenate(found)
+                sq_dist = (self.x[candidates] - x) ** 2 + (self.z[candidates] - z) ** 2
+                # Anything beyond ring r is more than r cells away from the query
+                if r >= r_max or np.partition(sq_dist, k - 1)[k - 1] <= (r * self.cell) ** 2:
+                    break
+            r += 1
+
+        best = np.lexsort((candidates, sq_dist))[:k]
+        return candidates[best], sq_dist[best]
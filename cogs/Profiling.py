@@ -0,0 +1,139 @@
+import cProfile
+import contextvars
+import functools
+import logging
+import os
+import pstats
+import re
+import time
+import tracemalloc
+from contextlib import asynccontextmanager
+
+# Opt-in profiling: one in PROFILE_EVERY runs of each slash command and refresh task is run under cProfile, and its
+# stats dumped to PROFILE_DIR (next to logs/) for pstats or snakeviz. 0 leaves it off; the bot owner can change it
+# at runtime with /profile, from the Diagnostics cog (this module holds the sampling state, so it is never loaded as
+# an extension, which would give the cog a copy of its own). TRACE_MALLOC, if set, is the number of frames
+# tracemalloc keeps, and the top allocators are logged after every data refresh.
+PROFILE_EVERY = int(os.environ.get("profile_every", 0))
+PROFILE_DIR = os.environ.get("profile_dir", "profiles/")
+TRACE_MALLOC = int(os.environ.get("trace_malloc", 0))
+TRACE_TOP = 10
+PROFILE_STATS = {"every": PROFILE_EVERY, "sampled": 0, "skipped": 0, "last": None}
+
+_calls = {}  # name -> runs so far, so each command and task is sampled on its own schedule
+_current = contextvars.ContextVar("profile_sample", default=None)
+_active = []  # the sample profiling the event loop thread, only one profiler can be enabled on it at a time
+_snapshots = {}  # refresh task -> its last tracemalloc snapshot, to log what grew since
+
+
+class Sample:
+    """One sampled run: a profiler over the event loop thread while the run is in progress, plus one for each job
+    it hands to the compute threads (see Compute.run), which are merged into the same dump. The event loop
+    profile also catches whatever other tasks ran on the loop in the meantime."""
+    __slots__ = ("name", "profile", "threads")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.profile = cProfile.Profile()
+        self.threads = []
+
+    def call(self, function, *args):
+        """Runs `function(*args)` under a profiler of the calling thread's own, kept for the dump."""
+        profile = cProfile.Profile()
+        self.threads.append(profile)
+        return profile.runcall(function, *args)
+
+    def dump(self):
+        """Writes the merged stats to PROFILE_DIR, returning the path."""
+        stats = pstats.Stats(self.profile)
+        for profile in self.threads:
+            stats.add(profile)
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, "{0}-{1}-{2}.prof".format(time.strftime("%Y%m%d-%H%M%S"),
+                                                                   re.sub(r"\W+", "_", self.name),
+                                                                   PROFILE_STATS["sampled"]))
+        stats.dump_stats(path)
+        return path
+
+
+def current():
+    """Returns the Sample the running command or task is being profiled under, or None."""
+    return _current.get()
+
+
+def due(name: str):
+    """Counts a run of `name` and returns whether it should be sampled, which is every PROFILE_EVERY-th run
+    starting with the first."""
+    every = PROFILE_STATS["every"]
+    count = _calls.get(name, 0)
+    _calls[name] = count + 1
+    return every > 0 and count % every == 0
+
+
+@asynccontextmanager
+async def sampled(name: str):
+    """Profiles the block if this run of `name` is due to be sampled, dumping the stats afterwards."""
+    if not due(name):
+        yield
+        return
+    if len(_active) != 0:  # another sampled run still has the event loop profiler
+        PROFILE_STATS["skipped"] += 1
+        yield
+        return
+
+    sample = Sample(name)
+    token = _current.set(sample)
+    _active.append(sample)
+    sample.profile.enable()
+    try:
+        yield
+    finally:
+        sample.profile.disable()
+        _active.remove(sample)
+        _current.reset(token)
+        try:
+            PROFILE_STATS["last"] = sample.dump()
+            PROFILE_STATS["sampled"] += 1
+            logging.info("Profiled {0}, stats in {1}".format(name, PROFILE_STATS["last"]))
+        except OSError as e:
+            logging.error("Could not save the profile of {0}: {1}".format(name, e))
+
+
+def log_allocations(name: str):
+    """Logs the top allocators (by line) after a refresh, and what grew the most since that refresh last ran."""
+    snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    current_size, peak = tracemalloc.get_traced_memory()
+    lines = ["{0} traced {1:.1f} MiB (peak {2:.1f} MiB), top allocators:"
+             .format(name, current_size / 2 ** 20, peak / 2 ** 20)]
+    lines += ["  {0}".format(stat) for stat in snapshot.statistics("lineno")[:TRACE_TOP]]
+    previous = _snapshots.get(name)
+    if previous is not None:
+        lines.append("  grew the most since the last {0}:".format(name))
+        grown = [stat for stat in snapshot.compare_to(previous, "lineno") if stat.size_diff > 0]
+        lines += ["  {0}".format(stat) for stat in grown[:TRACE_TOP]]
+    _snapshots[name] = snapshot
+    logging.info("\n".join(lines))
+
+
+def refresh(function):
+    """Decorator for the data refresh tasks (goes under @tasks.loop()): samples them like commands, and logs the
+    top allocators afterwards if tracemalloc is on."""
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        try:
+            async with sampled(function.__name__):
+                return await function(*args, **kwargs)
+        finally:
+            if tracemalloc.is_tracing():
+                log_allocations(function.__name__)
+    return wrapper
+
+
+def set_every(every: int):
+    """Changes how often runs are sampled, starting every schedule over so the next run of each is sampled."""
+    PROFILE_STATS["every"] = max(0, every)
+    _calls.clear()
+
+
+if TRACE_MALLOC > 0 and not tracemalloc.is_tracing():
+    tracemalloc.start(TRACE_MALLOC)
@@ -2,10 +2,20 @@ import discord
 import re
 from discord.ext import commands
 from discord_slash import cog_ext, SlashContext
-from discord_slash.utils.manage_commands import create_option
+from discord_slash.utils.manage_commands import create_choice, create_option
 
 from cogs.rails.RailTraverse import *
 from cogs.rails.RailHelpers import *
+from cogs.rails.RouteCache import RouteCache
+from cogs import Compute, Metrics
+
+
+def autocomplete_option(**kwargs):
+    """create_option for an option that Discord asks us to autocomplete (which can't also have fixed choices)."""
+    option = create_option(**kwargs)
+    del option["choices"]
+    option["autocomplete"] = True
+    return option
 
 
 class RailUtils(commands.Cog, name="RailUtils"):
@@ -15,35 +25,24 @@ class RailUtils(commands.Cog, name="RailUtils"):
         get_kani_json.start()
 
     @cog_ext.cog_slash(name="dest", description="Finds /dest commands",
-                       options=[create_option(name="origin", description="Enter an origin station",
-                                              option_type=3, required=True),
-                                create_option(name="destination", description="Enter an destination station",
-                                              option_type=3, required=True)])
+                       options=[autocomplete_option(name="origin", description="Enter an origin station",
+                                                    option_type=3, required=True),
+                                autocomplete_option(name="destination", description="Enter an destination station",
+                                                    option_type=3, required=True)])
     async def dest(self, ctx: SlashContext, origin: str, destination: str):
         """Discord slash ommand handler for /dest [origin] [destination]. Calls many functions to determine optimal
         route, then sends an embed to the sender showing best routes."""
 
         # Get info, return error if same
-        origin, destination = origin.lower(), destination.lower()
+        origin, destination = origin.strip().lower(), destination.strip().lower()
+        try:
+            fields = await dest_fields(origin, destination)
+        except Compute.ComputeBusy:
+            await ctx.send(Compute.BUSY, hidden=True)
+            return
         embed = discord.Embed(title="Route from {0} to {1}:".format(origin, destination), color=discord.Color.red())
-        if origin == destination:
-            embed.add_field(name="No route found!", value="You can't have the same origin and destination!")
-
-        kani_route, kani_dist = find_kani_route(origin, destination)
-        aura_route, aura_dist = find_aura_route(origin, destination)
-
-        # No routes found!
-        if len(kani_route) == 0:
-            orig_aliases, dest_aliases = find_alias(origin), find_alias(destination)
-            orig_aliases.update(names_close_to(origin))
-            dest_aliases.update(names_close_to(destination))
-            embed.add_field(name="No KANI route found!", value=handle_not_found(orig_aliases, dest_aliases))
-                
-        # Routing formatting
-        elif len(kani_route) > 0:
-            embed.add_field(name="KANI system:", value=kani_formatting(kani_route, kani_dist))
-        if len(aura_route) > 0:
-            embed.add_field(name="AURA system:", value=aura_formatting(aura_route, aura_dist))
+        for name, value in fields:
+            embed.add_field(name=name, value=value)
 
         # Footer, No Routes Found
         embed.set_footer(text="See amel.pw/kani or auracc.github.io for more information!")
@@ -55,14 +54,37 @@ class RailUtils(commands.Cog, name="RailUtils"):
 
         await ctx.send(embed=embed, hidden=True)
 
+    @commands.Cog.listener()
+    @Metrics.listener
+    async def on_autocomplete(self, interaction: dict):
+        """Answers autocomplete requests for the /dest origin and destination from the station trie."""
+        data = interaction["data"]
+        if data.get("name") != "dest":
+            return
+        focused = [option for option in data.get("options", []) if option.get("focused")]
+        if len(focused) == 0:
+            return
+        choices = [{"name": label, "value": value} for label, value in complete_station(str(focused[0]["value"]))]
+        await self.bot.slash.req.post_initial_response({"type": 8, "data": {"choices": choices}},
+                                                       interaction["id"], interaction["token"])
+
     @cog_ext.cog_slash(name="finddests",
                        description="Finds closest /dest locations to use",
                        options=[create_option(name="x", description="Civclassic x-coordinate to search",
                                               option_type=4, required=True),
                                 create_option(name="z", description="CivClassic z-coordinate to search",
-                                              option_type=4, required=True)])
-    async def finddests(self, ctx: SlashContext, x: int, z: int):
-        dests = find_closest_dests(x, z)
+                                              option_type=4, required=True),
+                                create_option(name="system", description="Rail system to search (default KANI)",
+                                              option_type=3, required=False,
+                                              choices=[create_choice(name="KANI", value="kani"),
+                                                       create_choice(name="AURA", value="aura")])])
+    async def finddests(self, ctx: SlashContext, x: int, z: int, system="kani"):
+        """Command handler for /finddests, lists the closest KANI (or AURA) stops to a point."""
+        try:
+            dests = await Compute.run(find_closest_dests, x, z, system == "aura")
+        except Compute.ComputeBusy:
+            await ctx.send(Compute.BUSY, hidden=True)
+            return
         if len(dests) == 0:
             await ctx.send("You're searching for nodes outside of the map!", hidden=True)
             return
@@ -79,8 +101,51 @@ class RailUtils(commands.Cog, name="RailUtils"):
                                                               item.get("x"), item.get("z"))
             info = "@".ljust(2, " ") + info if item.get("links") >= 3 else "".ljust(2, " ") + info
             out += info + "\n"
-        await ctx.send("**Dests near ({0}, {1}):**\nSee also: <https://amel.pw/kani> ```py\n{2}```"
-                       .format(str(x), str(z), out), embed=None, hidden=True)
+        see_also = "https://auracc.github.io" if system == "aura" else "https://amel.pw/kani"
+        await ctx.send("**Dests near ({0}, {1}):**\nSee also: <{2}> ```py\n{3}```"
+                       .format(str(x), str(z), see_also, out), embed=None, hidden=True)
+
+
+def route_fields(origin: str, destination: str):
+    """Calculates the KANI and AURA routes between two stations and returns them as (name, value) embed fields."""
+    fields = []
+    if origin == destination:
+        fields.append(("No route found!", "You can't have the same origin and destination!"))
+
+    kani_route, kani_dist = find_kani_route(origin, destination)
+    aura_route, aura_dist = find_aura_route(origin, destination)
+
+    # No routes found!
+    if len(kani_route) == 0:
+        orig_aliases, dest_aliases = find_alias(origin), find_alias(destination)
+        orig_aliases.update(names_close_to(origin))
+        dest_aliases.update(names_close_to(destination))
+        fields.append(("No KANI route found!", handle_not_found(orig_aliases, dest_aliases)))
+
+    # Routing formatting
+    elif len(kani_route) > 0:
+        fields.append(("KANI system:", kani_formatting(kani_route, kani_dist)))
+    if len(aura_route) > 0:
+        fields.append(("AURA system:", aura_formatting(aura_route, aura_dist)))
+    return tuple(fields)
+
+
+async def dest_fields(origin: str, destination: str):
+    """Returns the embed fields for a /dest query, from DEST_CACHE if the same (normalized) pair has already been
+    asked for since the last KANI/AURA refresh. Otherwise the routes are worked out on the compute threads; the
+    cache itself is only touched from the event loop."""
+    key = (origin, destination, graph_version())
+    fields = DEST_CACHE.get(key)
+    Metrics.cache("dest", fields is not None)
+    if fields is None:
+        fields = await Compute.run(route_fields, origin, destination)
+        DEST_CACHE.put(key, fields)
+    return fields
+
+
+DEST_CACHE = RouteCache(maxsize=1024)
+Metrics.watch("dest_cache_size", lambda: DEST_CACHE.stats()["size"])
+Metrics.watch("dest_cache_evictions", lambda: DEST_CACHE.stats()["evictions"])
 
 
 def setup(bot):
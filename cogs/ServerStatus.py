@@ -0,0 +1,70 @@
+import asyncio
+import datetime
+import logging
+import os
+from discord.ext import tasks
+from mcstatus import MinecraftServer
+from . import Metrics
+from .TTLCache import TTLCache
+
+# /ping answers for the default server come from a background poll, and any other server is pinged on demand
+# through a short-lived cache, so repeated pings of the same host (or a dead one) share a single probe.
+DEFAULT_SERVER = "mc.civclassic.com"
+POLL_SECONDS = int(os.environ.get("ping_poll", 60))
+PING_TIMEOUT = float(os.environ.get("ping_timeout", 5))  # seconds, DNS lookup and status handshake together
+STALE_AFTER = datetime.timedelta(seconds=2 * POLL_SECONDS)  # a poll this old means the polling has stopped
+STATUSES = TTLCache("server_status", ttl=30, maxsize=256)
+
+
+class Snapshot:
+    """The result of pinging a server: its status (None if it couldn't be reached, with the reason in `error`)
+    and when it was taken."""
+    __slots__ = ("host", "status", "error", "checked")
+
+    def __init__(self, host: str, status=None, error: str = ""):
+        self.host = host
+        self.status = status
+        self.error = error
+        self.checked = datetime.datetime.utcnow()
+
+
+async def probe(host: str):
+    """Resolves a server (the SRV lookup is blocking, so it runs in the default executor) and asks for its
+    status."""
+    server = await asyncio.get_running_loop().run_in_executor(None, MinecraftServer.lookup, host)
+    return await server.async_status(tries=1)
+
+
+async def fetch_status(host: str):
+    """Pings a server, giving up after PING_TIMEOUT. Failures are returned as a snapshot too, so a dead server is
+    cached like a live one instead of being probed again by every /ping."""
+    try:
+        return Snapshot(host, status=await asyncio.wait_for(probe(host), PING_TIMEOUT))
+    except asyncio.TimeoutError:
+        error = "timed out after {0:g}s".format(PING_TIMEOUT)
+    except OSError as e:  # DNS failures, refused connections
+        error = str(e) or type(e).__name__
+    except Exception as e:  # anything else is a response cut off or too garbled for mcstatus to read
+        error = "bad response ({0}: {1})".format(type(e).__name__, e)
+    logging.info("Could not ping {0}: {1}".format(host, error))
+    return Snapshot(host, error=error)
+
+
+async def get_status(host: str):
+    """Returns a snapshot of a server's status: the last poll for the default server (if there has been a recent
+    one), otherwise a cached or fresh ping."""
+    host = host.strip().lower()
+    if host == DEFAULT_SERVER and latest is not None and datetime.datetime.utcnow() - latest.checked < STALE_AFTER:
+        return latest
+    return await STATUSES.get(host, fetch_status, host)
+
+
+@tasks.loop(seconds=POLL_SECONDS)
+@Metrics.refresh
+async def poll_default():
+    """Task that pings the default server every POLL_SECONDS, so its /ping is answered from the last result."""
+    global latest
+    latest = await fetch_status(DEFAULT_SERVER)
+
+
+latest = None  # the last poll of DEFAULT_SERVER
@@ -1,42 +1,43 @@
+import aiohttp
+import asyncio
 import datetime
 import discord
 import logging
-import requests
 import re
-from .CivMap import find_closest, get_settlements, find_containing_poly
-from .Settings import get_wiki_setting
+from . import Compute, Players, ServerStatus
+from .CivMap import get_settlements, locate
 from discord.ext import commands
 from discord_slash import cog_ext, SlashContext
 from discord_slash.utils.manage_commands import create_option
-from mcstatus import MinecraftServer
-from string import whitespace
 
 
 class ServerUtils(commands.Cog, name="ServerUtils"):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         get_settlements.start()
+        ServerStatus.poll_default.start()
 
     @cog_ext.cog_slash(name="ping", description="Ping the default server or another server",
                        options=[create_option(name="server_ip", description="Enter a server IP (will default to CivClassic)",
                                               option_type=3, required=False)])
-    async def ping(self, ctx: SlashContext, server_ip="mc.civclassic.com"):
+    async def ping(self, ctx: SlashContext, server_ip=ServerStatus.DEFAULT_SERVER):
         """Command handler to ping a Minecraft server from the discord server"""
 
-        server = MinecraftServer.lookup(server_ip)
-        try:
-            status = server.status()
-            embed = discord.Embed(title=server_ip, color=discord.Color.dark_orange(),
-                                  description="Running {0}".format(status.version.name))
-            embed.add_field(name="Players Online",
-                            value="**{0}/{1}**".format(status.players.online, status.players.max))
-            embed.add_field(name="Latency", value="**{0}** ms".format(status.latency))
-            embed.add_field(name="Description", value=re.sub('§\S', '', status.description))
-            embed.set_footer(text="Pinged at {0} UTC".format(datetime.datetime.utcnow().strftime("%m/%d/%Y, %H:%M:%S")))
-            # set image of icon (if there is one)
-            await ctx.send(embed=embed)
-        except:
-            await ctx.send("Could not find **" + server_ip + "**, it's either offline or non-existent.")
+        snapshot = await ServerStatus.get_status(server_ip)
+        if snapshot.status is None:
+            await ctx.send("Could not find **{0}** ({1}), it's either offline or non-existent."
+                           .format(server_ip, snapshot.error))
+            return
+        status = snapshot.status
+        embed = discord.Embed(title=server_ip, color=discord.Color.dark_orange(),
+                              description="Running {0}".format(status.version.name))
+        embed.add_field(name="Players Online",
+                        value="**{0}/{1}**".format(status.players.online, status.players.max))
+        embed.add_field(name="Latency", value="**{0}** ms".format(status.latency))
+        embed.add_field(name="Description", value=re.sub('§\S', '', status.description))
+        embed.set_footer(text="Pinged at {0} UTC".format(snapshot.checked.strftime("%m/%d/%Y, %H:%M:%S")))
+        # set image of icon (if there is one)
+        await ctx.send(embed=embed)
 
     @cog_ext.cog_slash(name="whereis",description="Finds closest locations in CivClassic",
                        options=[create_option(name="x", description="CivClassic x-coordinate", option_type=4, required=True),
@@ -51,8 +52,11 @@ class ServerUtils(commands.Cog, name="ServerUtils"):
             await ctx.send(embed=embed, hidden=True)
             return
 
-        closest = find_closest(x, z)
-        containing_nation = find_containing_poly(x, z)
+        try:
+            closest, containing_nation = await Compute.run(locate, x, z)
+        except Compute.ComputeBusy:
+            await ctx.send(Compute.BUSY, hidden=True)
+            return
 
         out = ""
         longest_len = max([len(dest["name"]) + len(dest["nation"]) + 2 for dest in closest])
@@ -78,15 +82,20 @@ class ServerUtils(commands.Cog, name="ServerUtils"):
     async def whois(self, ctx: SlashContext, username: str):
         """Command handler to look up a username (find their name history, skin, etc.)"""
 
-        uuid = get_uuid(username)
+        try:
+            profile = await Players.lookup(username)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.warning("Could not look up {0}: {1}".format(username, e))
+            await ctx.send("Couldn't reach Mojang right now, please try again in a moment!", hidden=True)
+            return
         embed = discord.Embed(title="Name history of {0}:".format(username))
-        if uuid == "":
+        if profile is None:
             embed.add_field(name="Whoops!",
                             value="This username is currently unused right now; it could have been used in the past.\n"
                                   "Check **https://namemc.com/search?q={0}** for more information".format(username))
             await ctx.send(embed=embed)
             return
-        history = get_name_history(uuid)
+        uuid, history, civwiki_page = profile
         out = ""
         for item in history[::-1]:  # reverse so the oldest name is last, typical for most minecraft name history sites
             name = item.get("name")
@@ -102,7 +111,6 @@ class ServerUtils(commands.Cog, name="ServerUtils"):
 
         embed.set_footer(text="See also: https://namemc.com/search?q={0}".format(username))
         embed.add_field(name="UUID: ", value=uuid, inline=True)
-        civwiki_page = get_civwiki_page(username)
         if civwiki_page[1]:
             embed.add_field(name="CivWiki Page", value=civwiki_page[0], inline=False)
         embed.set_thumbnail(url="https://crafatar.com/avatars/{0}".format(uuid))
@@ -119,53 +127,9 @@ class ServerUtils(commands.Cog, name="ServerUtils"):
         url = "https://civwiki.org/wiki/" + page_name.replace(" ", "_")
         await ctx.send("{0}".format(url))
 
-    @commands.Cog.listener("on_message")
-    async def wikipage(self, ctx):
-        """discord.py listener to check for messages"""
-
-        if not await get_wiki_setting(ctx.guild.id) or \
-                ctx.author.bot or ctx.author.id == self.bot.user.id:  # Ignore self
-            return
-
-        def url(s: str):
-            return "https://civwiki.org/wiki/" + s.replace(" ", "_")
-
-        wiki_pattern = "\[{2}([^\]\n]+) *\]{2}"
-        pages = re.findall(wiki_pattern, ctx.content)
-        pages = [page for page in pages if page not in whitespace]
-        if len(pages) != 0:
-            page_list = ""
-            logging.info("Someone looked up {0} on CivWiki in {1} ({2})"
-                         .format(", ".join([page for page in pages[:5]]), ctx.guild.name, ctx.guild.id))
-            page_list += "\n".join([url(page) for page in pages[:5]])
-            if len(pages) == 1:
-                page_list = page_list.replace("<", "").replace(">", "")
-            await ctx.reply(page_list, mention_author=False)
-
     # other commands that will become part of this cog (for next release)
     # civmap [x] [y] [z] or civmap[name] to give a link to civmap
 
 
-def get_uuid(name: str):
-    r = requests.get("https://api.mojang.com/users/profiles/minecraft/{0}".format(name))
-    if r.status_code != 200:
-        return ""
-    return r.json().get("id")
-
-
-def get_name_history(uuid: str):
-    r = requests.get("https://api.mojang.com/user/profiles/{0}/names".format(uuid))
-    return r.json()
-
-
-def get_civwiki_page(page_name: str):
-    url = "https://civwiki.org/wiki/" + page_name.replace(" ", "_")
-    r = requests.head(url)
-    if r.status_code == 200:
-        return url, True
-    else:
-        return url, False
-
-
 def setup(bot):
     bot.add_cog(ServerUtils(bot))
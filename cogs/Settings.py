@@ -1,152 +1,158 @@
-import discord
+import logging
 import os
+import time
 import asyncpg as apg
-from discord.ext import commands
-from discord_slash import SlashContext, cog_ext
+from . import Metrics
 
 
+# Settings storage: the database pool, the settings cache and their queries, used by the cogs and main.py alike.
+# The /config commands live in the Config cog; this module is never loaded as an extension itself, since
+# load_extension runs a fresh copy of the module, with its own (unopened) pool and empty cache.
 DB_URL = os.environ["DATABASE_URL"]
 
 
-class Settings(commands.Cog, name="Settings"):
-    def __init__(self, bot: commands.Bot):
-        self.bot = bot
-
-    @cog_ext.cog_slash(name="disablemole", description="Disable or reenables the mole guy :(")
-    async def disablemole(self, ctx: SlashContext, **setting: bool):
-        """Command handler for /disablemole, superceded task to 'modify_mole'"""
-        await modify_mole(ctx)
-
-    @cog_ext.cog_slash(name="config", description="Show/select settings")
-    async def config(self, ctx: SlashContext):
-        """Top-level command for config commands"""
-        mole_setting = await get_mole(ctx.guild.id)
-        wiki_setting = await get_wiki_setting(ctx.guild.id)
-        embed = discord.Embed(title="Current settings:", description="`/mole`: {0}\n`/wiki` output: {1}"
-                              .format(str(mole_setting), str(wiki_setting)))
-        embed.set_footer(text="To change settings, do `/config mole` or `/config wiki`.")
-        await ctx.send(embed=embed)
-
-
-    @cog_ext.cog_subcommand(base="config", name="mole", description="Change /mole behavior")
-    async def config_mole(self, ctx: SlashContext):
-        """Command handler for mole subcommand of config, superceded task to 'modify_mole_'."""
-        await modify_mole(ctx)
-
-    @cog_ext.cog_subcommand(base="config", name="wiki", description="Change CivWiki query behavior")
-    async def config_wiki(self, ctx: SlashContext):
-        """Command handler for CivWiki subcommand of config, calls subroutines to set wiki value.
-           Either disables or enables [[wiki querying]] in this subcommand, but does not disable /civwiki."""
-        if ctx.guild is None:
-            await ctx.send("This can only be run in a discord.")
-        if ctx.author.guild_permissions.administrator or ctx.author.guild_permissions.manage_messages:
-            setting = not await get_wiki_setting(ctx.guild.id)
-            new_setting = await set_wiki_setting(server_id=ctx.guild.id, setting=setting)
-            if new_setting:
-                await ctx.send("Enabled [[ wiki querying ]] on this server. Do `/config wiki {setting}` to change it \
-                (`setting` is optional). You can also do `/civwiki` to query CivWiki anyway.")
-            else:
-                await ctx.send("Disabled [[ wiki querying ]] on this server. Do `/config wiki {setting}` to change it \
-                (`setting` is optional). You can also do `/civwiki` to query CivWiki anyway.")
-        else:  # Admins only
-            await ctx.send("Only users with administrator or manage messages permissions can use this command.",
-                           hidden=True)
-
-
-async def modify_mole(ctx: SlashContext):
-    """General handler for mole subcommand of config, calls subroutines to set mole value.
-    Either disables or enables /mole in this subcommand."""
-    if ctx.guild is None:
-        await ctx.send("This can only be run in a discord.")
-    if ctx.author.guild_permissions.administrator or ctx.author.guild_permissions.manage_messages:
-        setting = await change_mole(ctx.guild_id)
-        if setting:
-            await ctx.send("Enabled `/mole` on this server. Do `/disablemole` again to disable it."
-                           .format(ctx.guild.name))
-        else:  # Now set to false
-            await ctx.send("Disabled `/mole` on this server. Do `/disablemole` again to enable it."
-                           .format(ctx.guild.name))
-    else:  # Admins only
-        await ctx.send("Only users with administrator or manage messages permissions can use this command.",
-                       hidden=True)
+# Fixed queries, by name. asyncpg prepares each statement once per pooled connection and reuses it from the
+# connection's statement cache afterwards.
+QUERIES = {
+    "set_mole": """INSERT INTO settings(discord_id, mole) VALUES($1, $2) ON CONFLICT (discord_id) DO
+                   UPDATE SET mole = $2;""",
+    "set_wiki": """INSERT INTO settings(discord_id, wiki) VALUES($1, $2) ON CONFLICT (discord_id) DO
+                   UPDATE SET wiki = $2;""",
+    "all_settings": """SELECT discord_id, mole, wiki FROM settings;""",
+    # Returns the row whether it was just created or already there; xmax is 0 only for a freshly inserted row.
+    "init_settings": """INSERT INTO settings(discord_id, mole, wiki) VALUES ($1, FALSE, FALSE) ON CONFLICT
+                        (discord_id) DO UPDATE SET discord_id = EXCLUDED.discord_id
+                        RETURNING mole, wiki, (xmax = 0) AS inserted;""",
+    "delete_settings": """DELETE FROM settings WHERE discord_id = $1;""",
+}
+
+POOL_SIZE = int(os.environ.get("db_pool_size", 5))
+QUERY_STATS = {}  # query name -> {"count": calls, "total": seconds, "max": seconds}
+POOL_STATS = {"in_use": 0, "peak": 0, "acquires": 0, "waited": 0.0, "max_wait": 0.0}
+SETTINGS_CACHE = {}  # discord_id -> {"mole": bool, "wiki": bool}, written through by every setter
+_pool = None
+
+
+async def create_pool():
+    """Opens the connection pool, run once when the bot starts."""
+    global _pool
+    if _pool is None:
+        _pool = await apg.create_pool(dsn=DB_URL, min_size=1, max_size=POOL_SIZE)
+        logging.info("Opened database pool (max {0} connections)".format(POOL_SIZE))
+
+
+async def close_pool():
+    """Closes the connection pool, run when the bot shuts down."""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+async def run_query(name: str, *args, fetch=False):
+    """Runs one of the fixed QUERIES on a pooled connection, recording how long the pool took to hand out a
+    connection and how long the query itself took (in QUERY_STATS and the metrics). Returns the rows if `fetch`
+    is set."""
+    start = time.perf_counter()
+    async with _pool.acquire() as conn:
+        acquired = time.perf_counter()
+        Metrics.POOL_WAIT_SECONDS.observe(acquired - start)
+        POOL_STATS["acquires"] += 1
+        POOL_STATS["waited"] += acquired - start
+        POOL_STATS["max_wait"] = max(POOL_STATS["max_wait"], acquired - start)
+        POOL_STATS["in_use"] += 1
+        POOL_STATS["peak"] = max(POOL_STATS["peak"], POOL_STATS["in_use"])
+        try:
+            with Metrics.timed(Metrics.QUERY_SECONDS, Metrics.QUERY_ERRORS, name):
+                if fetch:
+                    result = await conn.fetch(QUERIES[name], *args)
+                else:
+                    result = await conn.execute(QUERIES[name], *args)
+        finally:
+            POOL_STATS["in_use"] -= 1
+            elapsed = time.perf_counter() - acquired
+            stats = QUERY_STATS.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+            stats["count"] += 1
+            stats["total"] += elapsed
+            stats["max"] = max(stats["max"], elapsed)
+    return result
+
+
+def pool_stats():
+    """Returns pool saturation (connections in use now and at peak, time spent waiting for one) along with the
+    per-query latency stats."""
+    queries = {name: dict(stats, mean=stats["total"] / stats["count"]) for name, stats in QUERY_STATS.items()}
+    return dict(POOL_STATS, max_size=POOL_SIZE, queries=queries)
+
+
+async def load_settings():
+    """Bulk loads every guild's settings into SETTINGS_CACHE, run when the bot is ready."""
+    rows = await run_query("all_settings", fetch=True)
+    SETTINGS_CACHE.clear()
+    SETTINGS_CACHE.update({row["discord_id"]: {"mole": row["mole"], "wiki": row["wiki"]} for row in rows})
+    logging.info("Loaded settings for {0} servers".format(len(SETTINGS_CACHE)))
+
+
+async def lookup_settings(server_id: int):
+    """Returns (settings, new) for a server from SETTINGS_CACHE. A server missing from the cache is created (or
+    read back, if it already exists) with a single upsert; `new` is whether that created it."""
+    settings = SETTINGS_CACHE.get(server_id)
+    Metrics.cache("settings", settings is not None)
+    if settings is not None:
+        return settings, False
+    row = (await run_query("init_settings", server_id, fetch=True))[0]
+    settings = SETTINGS_CACHE.setdefault(server_id, {"mole": row["mole"], "wiki": row["wiki"]})
+    return settings, row["inserted"]
+
+
+async def get_settings(server_id: int):
+    """Returns a copy of both settings for a server, ie. {"mole": bool, "wiki": bool}."""
+    return dict((await lookup_settings(server_id))[0])
+
 
 async def change_mole(server_id: int):
     """Tells PostgreSQL database to update the mole setting, or just return false if it's new."""
-    set_mole_command = """INSERT INTO settings(discord_id, mole) VALUES($1, $2) ON CONFLICT (discord_id) DO
-                            UPDATE SET mole = $3;"""
     old_setting = await get_mole(server_id)
     if old_setting == "New server":
         return False  # Just to notice that it's disabled as it's new.
         # Mostly for discords that used /disablemole prior to this update
 
     new_setting = not old_setting
-
-    conn = await apg.connect(dsn=DB_URL)
-    async with conn.transaction() as tr:
-        await conn.execute(set_mole_command, server_id, new_setting, new_setting)
+    await run_query("set_mole", server_id, new_setting)
+    SETTINGS_CACHE[server_id]["mole"] = new_setting
     return new_setting
 
 
 async def get_mole(server_id: int):
-    """Queries PostgreSQL database to get the mole setting, or return a special case if it's a new server."""
-    get_setting = """SELECT mole FROM settings WHERE discord_id = ($1);"""
-
-    conn = await apg.connect(dsn=DB_URL)
-    async with conn.transaction() as tr:
-        rows = await conn.fetch(get_setting, server_id)
-        if len(rows) == 0:  # The discord doesn't exist in the db yet because it's disabled by default.
-            set_mole_command = """INSERT INTO settings(discord_id, mole) VALUES($1, $2) ON CONFLICT (discord_id) DO
-                            UPDATE SET wiki = $3;"""
-            await conn.execute(set_mole_command, server_id, False, False)
-            return "New server"
-    return rows[0]  # Takes the first result, shows the first entry in the row
+    """Gets the mole setting, or return a special case if it's a new server."""
+    settings, new = await lookup_settings(server_id)
+    if new:  # The discord didn't exist in the db yet because it's disabled by default.
+        return "New server"
+    return settings["mole"]
 
 
 async def set_wiki_setting(server_id: int, setting: bool):
     """Requests PostgreSQL database to set `wiki` setting."""
-    get_setting = """SELECT wiki FROM settings WHERE discord_id = $1;"""
-
-    conn = await apg.connect(dsn=DB_URL)
-    async with conn.transaction() as tr:
-        rows = await conn.fetch(get_setting, server_id)
-        if len(rows) == 0:
-            setting = not rows[0][0]
-        set_mole_command = """INSERT INTO settings(discord_id, wiki) VALUES($1, $2) ON CONFLICT (discord_id) DO
-                                UPDATE SET wiki = $3;"""
-        await conn.execute(set_mole_command, server_id, setting, setting)
-    return setting  # Takes the first result, shows the first entry in the row
+    settings, _ = await lookup_settings(server_id)
+    await run_query("set_wiki", server_id, setting)
+    settings["wiki"] = setting
+    return setting
 
 
 async def get_wiki_setting(server_id: int):
-    """Queries PostgreSQL database to get `wiki` setting."""
-    get_setting = """SELECT wiki FROM settings WHERE discord_id = $1;"""
-
-    conn = await apg.connect(dsn=DB_URL)
-    async with conn.transaction() as tr:
-        rows = await conn.fetch(get_setting, server_id)
-        if len(rows) == 0:  # The discord doesn't exist in the db yet because it's disabled by default.
-            await set_wiki_setting(server_id, False)
-            return False
-    return rows[0][0]
+    """Gets the `wiki` setting, which is disabled for new servers."""
+    return (await lookup_settings(server_id))[0]["wiki"]
 
 
 async def init_settings(server_id: int):
     """Initializes settings upon a new server entering."""
-    conn = await apg.connect(dsn=DB_URL)
-    with conn.transaction() as tr:
-        conn.execute("""INSERT INTO settings(discord_id) VALUES ($1);""", server_id)
+    await lookup_settings(server_id)
 
 
 async def left_discord(server_id: int):
     """Deletes entry upon a leaving a server by any means."""
-    cmd = """DELETE FROM settings WHERE discord_id = $1;"""
-    conn = await apg.connect(dsn=DB_URL)
-    with conn.transaction() as tr:
-        try:
-            conn.execute(cmd, server_id)
-        except:
-            pass
+    await run_query("delete_settings", server_id)
+    SETTINGS_CACHE.pop(server_id, None)
 
 
-def setup(bot):
-    bot.add_cog(Settings(bot))
+Metrics.watch("db_connections_in_use", lambda: POOL_STATS["in_use"])
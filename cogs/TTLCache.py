@@ -0,0 +1,55 @@
+import asyncio
+import time
+from collections import OrderedDict
+from . import Metrics
+
+
+class TTLCache:
+    """Async cache whose entries expire `ttl` seconds after they were fetched. A miss runs the fetch coroutine
+    once, and concurrent lookups of the same key wait on that one fetch instead of starting their own (single
+    flight). Failed fetches aren't cached, so the next lookup tries again. Lookups are recorded in the metrics
+    under `name`."""
+    __slots__ = ("name", "ttl", "maxsize", "entries", "pending")
+
+    def __init__(self, name: str, ttl: float, maxsize: int = 1024):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.entries = OrderedDict()  # key -> (expiry, value), oldest first
+        self.pending = {}  # key -> future of the fetch in flight
+
+    async def get(self, key, fetch, *args):
+        """Returns the cached value for `key`, or the result of `await fetch(*args)` if there is none."""
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            Metrics.cache(self.name, True)
+            return entry[1]
+        Metrics.cache(self.name, False)
+        future = self.pending.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._fill(key, fetch, *args))
+            self.pending[key] = future
+        # Shielded, so a waiter that gets cancelled doesn't cancel the fetch the others are waiting on
+        return await asyncio.shield(future)
+
+    async def _fill(self, key, fetch, *args):
+        try:
+            value = await fetch(*args)
+            self.put(key, value)
+            return value
+        finally:
+            del self.pending[key]
+
+    def put(self, key, value):
+        """Stores a value, dropping the oldest entries if the cache is full. Every entry lives equally long, so
+        the oldest are also the first to expire."""
+        self.entries.pop(key, None)
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,102 @@
+import logging
+import numpy as np
+import time
+from heapq import heappop, heappush
+from math import inf
+from .RailGraph import RailGraph
+
+LANDMARKS = 8
+
+
+def reverse_adjacency(graph: RailGraph):
+    """Returns the links of a compiled graph reversed, as CSR (offsets, targets, weights) like the graph's own."""
+    incoming = [[] for _ in range(len(graph))]
+    for node in range(len(graph)):
+        for i in range(graph.offsets[node], graph.offsets[node + 1]):
+            incoming[graph.targets[i]].append((node, graph.weights[i]))
+    offsets, targets, weights = [0], [], []
+    for links in incoming:
+        for node, weight in links:
+            targets.append(node)
+            weights.append(weight)
+        offsets.append(len(targets))
+    return offsets, targets, weights
+
+
+def distances(offsets: list, targets: list, weights: list, source: int):
+    """Plain Dijkstra distances from `source` over CSR adjacency, inf where unreachable. Unlike routing, every node
+    may be passed through, so these are lower bounds for routes that have to stop at stop nodes."""
+    g = [inf] * (len(offsets) - 1)
+    g[source] = 0
+    heap = [(0, source)]
+    while len(heap) != 0:
+        d, current = heappop(heap)
+        if d > g[current]:
+            continue
+        for i in range(offsets[current], offsets[current + 1]):
+            tentative = d + weights[i]
+            if tentative < g[targets[i]]:
+                g[targets[i]] = tentative
+                heappush(heap, (tentative, targets[i]))
+    return g
+
+
+class Landmarks:
+    """Landmark (ALT) distance tables for a static-cost graph, built once per refresh. `dist_from[l, v]` is the
+    distance from landmark `l` to `v` and `dist_to[l, v]` from `v` to the landmark; by the triangle inequality,
+    `dist_from[l, t] - dist_from[l, v]` and `dist_to[l, v] - dist_to[l, t]` are both lower bounds on the distance
+    from `v` to `t`. Landmarks are picked farthest-first, so they sit on the edges of the network where those
+    bounds are tightest. Also keeps the reversed adjacency, for searching backwards from a destination."""
+    __slots__ = ("graph", "landmarks", "dist_from", "dist_to", "reverse", "x", "z")
+
+    def __init__(self, graph: RailGraph, count: int = LANDMARKS):
+        self.graph = graph
+        self.reverse = reverse_adjacency(graph)
+        self.x = np.asarray(graph.x, dtype=np.float64)
+        self.z = np.asarray(graph.z, dtype=np.float64)
+        n, forward = len(graph), (graph.offsets, graph.targets, graph.weights)
+
+        self.landmarks, dist_from, dist_to = [], [], []
+        far = np.zeros(n)
+        candidate = 0
+        while n and len(self.landmarks) < min(count, n):
+            if len(self.landmarks) == 0:  # start from whatever is farthest from node 0
+                first = np.asarray(distances(*forward, 0))
+                candidate = int(np.argmax(np.where(np.isfinite(first), first, -1)))
+            self.landmarks.append(candidate)
+            dist_from.append(distances(*forward, candidate))
+            dist_to.append(distances(*self.reverse, candidate))
+            # Nodes a landmark can't reach count as infinitely far, so disconnected parts get landmarks too
+            reach = np.asarray(dist_from[-1]) + np.asarray(dist_to[-1])
+            far = reach if len(self.landmarks) == 1 else np.minimum(far, reach)
+            far[self.landmarks] = -1
+            candidate = int(np.argmax(far))
+            if far[candidate] <= 0:
+                break
+        self.dist_from = np.array(dist_from, dtype=np.float64).reshape(-1, n)
+        self.dist_to = np.array(dist_to, dtype=np.float64).reshape(-1, n)
+
+    def bounds(self, node: int, reverse: bool = False):
+        """Returns lower bounds on the distance from every node to `node` (or from `node` to every node, if
+        `reverse` is set) all at once: the best of the straight line distance and the landmark bounds. These are
+        the heuristic for a search towards `node`. Nodes that can't reach `node` at all (or be reached) get inf."""
+        dist_from, dist_to = (self.dist_to, self.dist_from) if reverse else (self.dist_from, self.dist_to)
+        with np.errstate(invalid="ignore"):  # inf - inf, for nodes a landmark doesn't reach either way
+            h = np.hypot(self.x - self.x[node], self.z - self.z[node])
+            if len(self.landmarks) != 0:
+                h = np.fmax(h, np.fmax.reduce(dist_from[:, node, None] - dist_from, axis=0))
+                h = np.fmax(h, np.fmax.reduce(dist_to - dist_to[:, node, None], axis=0))
+        return h.tolist()
+
+    @property
+    def nbytes(self):
+        return self.dist_from.nbytes + self.dist_to.nbytes
+
+
+def build_landmarks(graph: RailGraph):
+    """Builds the landmark tables for a graph, logging how long it took and how much memory it uses."""
+    start = time.perf_counter()
+    landmarks = Landmarks(graph)
+    logging.info("Built {0} landmarks for {1} nodes in {2:.2f}s ({3:.1f} KiB)"
+                 .format(len(landmarks.landmarks), len(graph), time.perf_counter() - start, landmarks.nbytes / 1024))
+    return landmarks
@@ -0,0 +1,116 @@
+import logging
+from math import dist
+from ..PointIndex import PointIndex
+
+
+def edge_length(x1, z1, x2, z2):
+    """Edge cost between two points, the average of the euclidean and the taxicab (manhattan) distance."""
+    return (sum([abs(x1 - x2), abs(z1 - z2)]) + dist([x1, z1], [x2, z2])) / 2
+
+
+class RailGraph:
+    """Compiled form of a KANI or AURA JSON, built once per refresh so searches never touch the JSON dicts.
+    Nodes are integer ids into parallel lists, and adjacency is stored CSR-style: the links of node `i` are
+    `targets[offsets[i]:offsets[i + 1]]`, with the matching precomputed edge lengths in `weights`."""
+    __slots__ = ("aura", "names", "ids", "x", "z", "station", "switch", "stop", "line", "types",
+                 "offsets", "targets", "weights", "links", "badlinks", "link_dests",
+                 "dest", "dest_a", "dest_b", "dest_stop", "dest_junction")
+
+    def __init__(self, nodes: dict, aura=False):
+        self.aura = aura
+        self.names = list(nodes.keys())
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        data = [nodes[name] for name in self.names]
+
+        self.x = [d.get("x", 0) for d in data]
+        self.z = [d.get("z", 0) for d in data]
+        self.station = [d.get("station", False) for d in data]
+        self.switch = [d.get("switch", False) for d in data]
+        self.types = [d.get("type", "") for d in data]
+        if aura:
+            self.stop = [t == "stop" for t in self.types]
+        else:
+            self.stop = [not (st or sw) for st, sw in zip(self.station, self.switch)]
+        # AURA line nodes have no coordinates of their own, they take them from whichever node reaches them first
+        self.line = [aura and t == "line" for t in self.types]
+
+        self.offsets, self.targets, self.weights = [0], [], []
+        self.links, self.badlinks, self.link_dests = [], [], []
+        for name, d in zip(self.names, data):
+            i = self.ids[name]
+            links = []
+            for link in d.get("links", []):
+                j = self.ids.get(link)
+                if j is None:
+                    logging.warning("Dropping dangling link {0} -> {1} from the {2} graph"
+                                    .format(name, link, "AURA" if aura else "KANI"))
+                    continue
+                links.append(link)
+                self.targets.append(j)
+                self.weights.append(edge_length(self.x[i], self.z[i], self.x[j], self.z[j]))
+            self.offsets.append(len(self.targets))
+            self.links.append(links)
+
+            bad = d.get("bad_links" if aura else "BadLinks", {})
+            self.badlinks.append({self.ids[k]: v for k, v in bad.items() if k in self.ids})
+            self.link_dests.append({self.ids[k]: v for k, v in d.get("link_dests", {}).items() if k in self.ids})
+
+        self.dest = [d.get("dest", "") for d in data]
+        self.dest_a = [d.get("dest_a", "") for d in data]
+        self.dest_b = [d.get("dest_b", "") for d in data]
+        self.dest_stop = [d.get("dest_stop", "") for d in data]
+        self.dest_junction = [d.get("dest_junction", "") for d in data]
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+
+def compile_kani(kani_json: dict):
+    """Builds the compiled graph for KANI from the export JSON."""
+    return RailGraph(kani_json)
+
+
+def compile_aura(aura_json: dict):
+    """Builds the compiled graph for AURA from computed.json (only the nodes are routed over)."""
+    return RailGraph(aura_json.get("nodes", {}), aura=True)
+
+
+class DestTable:
+    """Stops that can be entered with /dest, as a name list with parallel coordinates and link counts plus a
+    PointIndex over the coordinates, for /finddests. Rebuilt whenever the KANI or AURA data reloads.
+    `nations` holds the claim each stop lies in, filled in by annotate."""
+    __slots__ = ("names", "x", "z", "links", "index", "nations")
+
+    def __init__(self, names: list, x: list, z: list, links: list):
+        self.names = names
+        self.x = x
+        self.z = z
+        self.links = links
+        self.index = PointIndex(x, z)
+        self.nations = [""] * len(names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def annotate(self, claim_index):
+        """Stores the containing claim of every stop, run whenever the stops or the claims refresh."""
+        self.nations = claim_index.containing(self.x, self.z)
+
+
+def kani_dests(kani_json: dict):
+    """Builds the /finddests table for KANI, which is every node except junctions."""
+    names = [name for name in kani_json.keys() if "j:" not in name[:2]]
+    return DestTable(names, [kani_json[name]["x"] for name in names], [kani_json[name]["z"] for name in names],
+                     [len(kani_json[name].get("links", [])) for name in names])
+
+
+def aura_dests(aura_json: dict):
+    """Builds the /finddests table for AURA, which is every kind of stop that has coordinates."""
+    nodes = aura_json.get("nodes", {})
+    names = [name for name, d in nodes.items()
+             if d.get("type") in ["stop", "junctionstop", "stopjunction"] and "x" in d and "z" in d]
+    return DestTable(names, [nodes[name]["x"] for name in names], [nodes[name]["z"] for name in names],
+                     [len(nodes[name].get("links", [])) for name in names])
@@ -1,38 +1,28 @@
-from ..CivMap import find_containing_poly
-from .RailTraverse import *
-from math import dist, atan2, degrees
+from ..CivMap import DIRECTIONS
+from . import RailTraverse
+import numpy as np
 
 
-def find_closest_dests(x: int, z: int):
+def find_closest_dests(x: int, z: int, aura=False):
     """Finds the closest dest locations given a point. This is near a recreation from CivMap's closest dests
-       algorithm, but is slightly modified to also check whether a claim contains that dest."""
+       algorithm, but is slightly modified to also give the claim containing that dest (precomputed on refresh).
+       Searches KANI stops by default, or AURA stops if `aura` is set."""
     if abs(x) >= 13000 or abs(z) >= 13000:
         return []
-    distances = {}
-    for dest in KANI_JSON.keys():
-        data = KANI_JSON.get(dest)
-        if "j:" not in dest[:2]:
-            distance = dist([x, z], [data["x"], data["z"]])
-            distances[dest] = distance
-
-    closest = list({k: v for k, v in sorted(distances.items(), key=lambda item: item[1])})[:10]
-    closest_dests = []
-
-    for dest in closest:
-        data = KANI_JSON.get(dest)
-        to_dist = distances[dest]
-        angle = degrees(atan2(data["z"] - z, data["x"] - x)) + 90
-        angle = angle if angle >= 0 else angle + 360
-        links = len(data["links"])
+    table = RailTraverse.AURA_DESTS if aura else RailTraverse.KANI_DESTS
+    ids, sq_dist = table.index.nearest(x, z, 10)
 
-        directions = ["N", "NNW", "NW", "WNW", "W", "WSW", "SW", "SSW", "S", "SSE", "SE", "ESE",
-                      "E", "ENE", "NE", "NNE", "N"]
-        direction = directions[int(angle // 22.5)]
+    # Distances, angles and directions for the whole result set at once
+    distances = np.sqrt(sq_dist)
+    angles = np.degrees(np.arctan2(table.index.z[ids] - z, table.index.x[ids] - x)) + 90
+    angles = np.where(angles >= 0, angles, angles + 360)
+    directions = (angles // 22.5).astype(int)
 
-        containing_nation = find_containing_poly(data["x"], data["z"])
-
-        closest_dests.append({"name": dest, "distance": to_dist, "x": data["x"], "z": data["z"],
-                              "angle": angle, "links": links, "direction": direction, "nation": containing_nation})
+    closest_dests = []
+    for i, to_dist, angle, direction in zip(ids.tolist(), distances.tolist(), angles.tolist(), directions.tolist()):
+        closest_dests.append({"name": table.names[i], "distance": to_dist, "x": table.x[i], "z": table.z[i],
+                              "angle": angle, "links": table.links[i], "direction": DIRECTIONS[direction],
+                              "nation": table.nations[i]})
 
     return closest_dests
 
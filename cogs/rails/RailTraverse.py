@@ -1,12 +1,26 @@
+import asyncio
+import functools
 from discord.ext import tasks
+from heapq import heappop, heappush
 from typing import List
-from math import dist
-from queue import PriorityQueue
+from math import dist, inf
+from .. import CivMap, Metrics, Profiling
+from ..DataFetch import applied, fetch_all, save_json, KANI_URL, AURA_URL
+from .RailGraph import RailGraph, edge_length, compile_kani, compile_aura, kani_dests, aura_dests
 from .RailHelpers import *
-import difflib
+from .Landmarks import Landmarks, build_landmarks
+from .RouteTable import RouteTable, build_route_table
+from .StationSearch import StationIndex, StationTrie
 import json
 import logging
-import requests
+import os
+import time
+
+# Graphs up to this many nodes get an all-pairs route table; bigger ones (which would need n^2 memory) are searched
+# per query with landmarks instead.
+ROUTE_TABLE_LIMIT = int(os.environ.get("route_table_limit", 2000))
+SEARCH_MODE = os.environ.get("search_mode", "alt")  # "alt" or "bidirectional", for graphs without a route table
+TIE_TOLERANCE = 1e-9  # relative difference below which two route lengths count as tied
 
 
 class RailNode:
@@ -63,77 +77,102 @@ class AuraNode(RailNode):
         self.link_dests = data.get("link_dests", {})
 
 
-def euclid(start, end):
-    """Helper function that calculates distance."""
-    return dist([start.x, start.z], [end.x, end.z])
-
-
-def taxi(start, end):
-    """Helper function that calculates distance VIA manhattan method, ie. absolute value."""
-    return sum([abs(start.x - end.x), abs(start.z - end.z)])
-
-
 def load_kani_json():
-    """Helper function to load KANI_JSON from the file (may not be needed)"""
+    """Helper function to load KANI_JSON from the file, only used on a cold start."""
     with open("resources/kani.json", "r") as fp:
         return json.load(fp)
 
 
 def load_aura_json():
-    """Helper function to load AURA_JSON from the file (may not be needed)"""
+    """Helper function to load AURA_JSON from the file, only used on a cold start."""
     with open("resources/aura.json", "r") as fp:
         return json.load(fp)
 
 
 @tasks.loop(hours=3.0)
+@Metrics.refresh
+@Profiling.refresh
 async def get_kani_json():
     """Coroutine that is automatically scheduled every 3 hours to grab the KANI JSON."""
-    logging.info("Grabbing KANI JSON file from GitHub at "
-                 "https://raw.githubusercontent.com/Ameliorate/KANI/master/docs/export.json")
-
-    r = requests.get("https://raw.githubusercontent.com/Ameliorate/KANI/master/docs/export.json")
-    k = r.json()
-    with open("resources/kani.json", "w+") as fp:
-        fp.truncate(0)  # clear file to reload it
-        json.dump(k, fp)
-    global KANI_JSON, KANI_ALIASES
-    KANI_JSON = load_kani_json()
-    KANI_ALIASES = get_aliases()
+    logging.info("Grabbing KANI JSON file from GitHub at " + KANI_URL)
+
+    [k] = await fetch_all(KANI_URL)
+    if k is None:
+        return  # unchanged or unavailable, keep the current data
+    start = time.perf_counter()
+    save_json("resources/kani.json", k)
+    aura_json = AURA_JSON
+    build = functools.partial(build_kani, k, get_aura_names())
+    sample = Profiling.current()  # the build runs on another thread, so a sampled refresh profiles it there
+    if sample is not None:
+        build = functools.partial(sample.call, build)
+    built = await asyncio.get_running_loop().run_in_executor(None, build)
+    global KANI_JSON, KANI_ALIASES, STATION_SEARCH, STATION_TRIE, KANI_GRAPH, KANI_ROUTES, KANI_LANDMARKS, \
+        KANI_DESTS, GRAPH_VERSION
+    KANI_JSON = k
+    KANI_ALIASES, STATION_SEARCH, STATION_TRIE, KANI_GRAPH, KANI_ROUTES, KANI_LANDMARKS, KANI_DESTS = built
+    if AURA_JSON is not aura_json:  # AURA was reloaded during the build, so its names in the search are outdated
+        STATION_SEARCH, STATION_TRIE = build_station_search(KANI_ALIASES, get_aura_names())
+    KANI_DESTS.annotate(CivMap.claim_index)
+    GRAPH_VERSION += 1
+    applied(KANI_URL, time.perf_counter() - start)
 
 
 @tasks.loop(hours=3.0)
+@Metrics.refresh
+@Profiling.refresh
 async def get_aura_json():
     """Coroutine that is automatically scheduled every 3 hours to grab the AURA JSON."""
-    logging.info("Grabbing AURA JSON file from Github at "
-                 "https://raw.githubusercontent.com/auracc/aura-toml/main/computed.json")
+    logging.info("Grabbing AURA JSON file from GitHub at " + AURA_URL)
+
+    [a] = await fetch_all(AURA_URL)
+    if a is None:
+        return  # unchanged or unavailable, keep the current data
+    start = time.perf_counter()
+    save_json("resources/aura.json", a)
+    global AURA_JSON, AURA_NODES, AURA_NAMES, AURA_DEST_NODES, STATION_SEARCH, STATION_TRIE, AURA_GRAPH, AURA_DESTS, \
+        GRAPH_VERSION
+    AURA_JSON = a
+    AURA_NODES, AURA_NAMES, AURA_DEST_NODES = index_aura(AURA_JSON)
+    STATION_SEARCH, STATION_TRIE = build_station_search(KANI_ALIASES, get_aura_names())
+    AURA_GRAPH = compile_aura(AURA_JSON)
+    AURA_DESTS = aura_dests(AURA_JSON)
+    AURA_DESTS.annotate(CivMap.claim_index)
+    GRAPH_VERSION += 1
+    applied(AURA_URL, time.perf_counter() - start)
+
 
-    r = requests.get("https://raw.githubusercontent.com/auracc/aura-toml/main/computed.json")
-    a = r.json()
-    with open("resources/aura.json", "w+") as fp:
-        fp.truncate(0)  # clear file to reload it
-        json.dump(a, fp)
-    global AURA_JSON
-    AURA_JSON = load_aura_json()
+def annotate_dests():
+    """Re-annotates the KANI and AURA stops with their containing claims, run after the claims refresh."""
+    KANI_DESTS.annotate(CivMap.claim_index)
+    AURA_DESTS.annotate(CivMap.claim_index)
 
 
-def reconstruct_path(node: RailNode):
+def graph_version():
+    """Returns a stamp that changes whenever the KANI or AURA data is reloaded, for keying cached results."""
+    return GRAPH_VERSION
+
+
+def reconstruct_path(graph: RailGraph, node: int, parent: List[int]):
     """Reconstructs the KANI pathway from the destinations given, after A* algorithm is called.
      Only calculates KANI pathways."""
+    names, x, z = graph.names, graph.x, graph.z
     path = []
-    if node.station:
-        path.append(node.name + ":exit")
-    path.append(node.name)
+    if graph.station[node]:
+        path.append(names[node] + ":exit")
+    path.append(names[node])
     tot_dist = 0
 
-    while node.parent is not None:
-        tot_dist += (euclid(node, node.parent) + taxi(node, node.parent)) / 2
-        if node.name in node.parent.badlinks.keys():
-            path.append(node.parent.badlinks.get(node.name))
+    while parent[node] != -1:
+        prev = parent[node]
+        tot_dist += edge_length(x[node], z[node], x[prev], z[prev])
+        if node in graph.badlinks[prev]:
+            path.append(graph.badlinks[prev][node])
         else:
-            path.append(node.name)
-        node = node.parent
+            path.append(names[node])
+        node = prev
 
-    path.append(node.name)
+    path.append(names[node])
 
     new_path = []
     for i in path:
@@ -148,55 +187,55 @@ def reconstruct_path(node: RailNode):
     return path[::-1], tot_dist  # need to reverse path
 
 
-def reconstruct_aura_path(node: AuraNode):
+def reconstruct_aura_path(graph: RailGraph, node: int, parent: List[int], x: List[float], z: List[float]):
     """Reconstructs the AURA pathway from the destinations given, after A* algorithm is called.
-    Only calculates AURA pathways, as more things are involved."""
+    Only calculates AURA pathways, as more things are involved. Takes the coordinates used by the search,
+    as line nodes are placed wherever they were reached from."""
+    names, types, dest = graph.names, graph.types, graph.dest
     path = []
     tot_dist = 0
 
-    if node.type == "junctionstop":
-        path.append(node.dest_stop)
-    if node.dest == "":
-        path.append(node.name)
+    if types[node] == "junctionstop":
+        path.append(graph.dest_stop[node])
+    if dest[node] == "":
+        path.append(names[node])
     else:
-        path.append(node.dest)
-
-    print(path)
+        path.append(dest[node])
 
     last_node = None
     first_node = node
 
-    while node.parent is not None:
-        print(node, node.parent)
-        tot_dist += (euclid(node, node.parent) + taxi(node, node.parent)) / 2
+    while parent[node] != -1:
+        prev = parent[node]
+        tot_dist += edge_length(x[node], z[node], x[prev], z[prev])
 
-        if node.type == "line":
-            start_index = node.links.index(node.parent.name)
-            end_index = node.links.index(last_node.name)
+        if types[node] == "line":
+            start_index = graph.links[node].index(names[prev])
+            end_index = graph.links[node].index(names[last_node])
 
             # Reverse for path
             if start_index < end_index:
-                path.append(node.dest_b)
+                path.append(graph.dest_b[node])
             else:
-                path.append(node.dest_a)
+                path.append(graph.dest_a[node])
 
         # Skip if node didn't use the junction
-        elif node.type == "stopjunction" and first_node != node:
-            path.append(node.dest_junction)
-            path.append(node.dest)
-        elif node.type == "crossing":
+        elif types[node] == "stopjunction" and first_node != node:
+            path.append(graph.dest_junction[node])
+            path.append(dest[node])
+        elif types[node] == "crossing":
             pass  # no additional dests added
-        elif node.name in node.parent.badlinks.keys():
-            path.append(node.parent.badlinks[node.name])
+        elif node in graph.badlinks[prev]:
+            path.append(graph.badlinks[prev][node])
         else:
-            path.append(node.dest)
+            path.append(dest[node])
 
         last_node = node  # in case for lines
-        node = node.parent
+        node = prev
 
     # Special case when the first stop needs to access a line to get on the system
-    if last_node.type == "line":
-        path.append(node.link_dests.get(last_node.name, ""))
+    if types[last_node] == "line":
+        path.append(graph.link_dests[node].get(last_node, ""))
 
     lookup = set()
     path = [x for x in path if x not in lookup and lookup.add(x) is None]
@@ -205,22 +244,56 @@ def reconstruct_aura_path(node: AuraNode):
 
 def find_kani_route(start: str, end: str):
     """Entry point for KANI pathfinding, given a start and end will return the path."""
-    start_node = kani_node(start)
-    end_node = kani_node(end)
-    if start_node is None or end_node is None:
+    # Read once, a refresh may swap in new tables while this runs on a compute thread
+    table, landmarks, graph = KANI_ROUTES, KANI_LANDMARKS, KANI_GRAPH
+    start_id = graph.ids.get(start)
+    end_id = graph.ids.get(end)
+    if start_id is None or end_id is None:
         start_alias = find_alias(start)
         if len(start_alias) != 1:
             return [], 0
-        start_node = kani_node(start_alias.pop())
+        start_id = graph.ids.get(start_alias.pop())
 
-    if end_node is None:
+    if end_id is None:
         end_alias = find_alias(end)
         if len(end_alias) != 1:
             return [], 0
-        end_node = kani_node(end_alias.pop())
+        end_id = graph.ids.get(end_alias.pop())
+
+    if start_id is None or end_id is None:  # aliases from a newer refresh than the table
+        return [], 0
+    if table is None:
+        return search_route(graph, landmarks, start_id, end_id)
+    return table_route(table, start_id, end_id)
+
+
+def build_kani(kani_json: dict, aura_names: dict):
+    """Builds everything derived from a KANI download: (aliases, station search, station trie, graph, route
+    table, landmarks, stop table), where only one of the route table and landmarks is built. Run off the event loop
+    on a refresh, since the route table alone can take seconds for a big graph; the results are swapped in after."""
+    aliases = get_aliases(kani_json)
+    graph = compile_kani(kani_json)
+    table, landmarks = build_kani_routing(graph)
+    return (aliases, *build_station_search(aliases, aura_names), graph, table, landmarks, kani_dests(kani_json))
 
-    print(start_node, end_node)
-    return astar(start_node, end_node)
+
+def build_kani_routing(graph: RailGraph):
+    """Builds what KANI routes are answered from: the route table if the graph is small enough for one, or the
+    landmark tables used instead when there is no route table. Whichever isn't needed is None."""
+    table = build_route_table(graph) if len(graph) <= ROUTE_TABLE_LIMIT else None
+    return table, (build_landmarks(graph) if table is None else None)
+
+
+def table_route(table: RouteTable, start: int, end: int):
+    """Answers a route from a precomputed route table, giving the same (path, distance) astar would.
+    Routes with an equally long alternative are left to astar, so ties are settled the same way."""
+    if start == end:
+        return [], -2
+    if not table.exact(start, end):
+        return astar(table.graph, start, end)
+    if not table.reachable(start, end):
+        return [], 0
+    return reconstruct_path(table.graph, end, table.parents(start))
 
 
 def find_aura_route(start: str, end: str):
@@ -235,84 +308,285 @@ def find_aura_route(start: str, end: str):
     if start_node.type in incorrect_types or end_node.type in incorrect_types:
         return [], -1  # not a valid pair
 
-    return astar(start_node, end_node, aura_routing=True)
+    graph = AURA_GRAPH  # read once, like KANI_ROUTES in find_kani_route
+    if start_node.name not in graph or end_node.name not in graph:
+        return [], 0
+    return astar(graph, graph.ids[start_node.name], graph.ids[end_node.name])
 
 
 # Adapted from pseudocode at https://en.wikipedia.org/wiki/A*_search_algorithm#Pseudocode
-def astar(start_node: RailNode, end_node: RailNode, aura_routing=False):
-    """Implementation of A* pathfinding algorithm to pathfind routes between two nodes.
-       This has the added benefit of being able to calculate destinations for AURA and KANI when necessary."""
-    if start_node == end_node:
+def astar(graph: RailGraph, start: int, end: int, stats: dict = None):
+    """Implementation of A* pathfinding algorithm to pathfind routes between two nodes of a compiled graph.
+       This has the added benefit of being able to calculate destinations for AURA and KANI when necessary.
+       If `stats` is given, the number of nodes expanded is added to its "expanded" count."""
+    if start == end:
         return [], -2
 
-    # TODO: Is there are need for node objects anymore?
-    # Priority queue implemented as the heapdict package; this particular package allows us to change priorities.
-
-    # This stores f & g scores for us so it's not in the nodes.
-    open_list = {start_node.name: {"node": start_node, "f": euclid(start_node, end_node), "g": 0}}
-    closed_list = {}
-
-    def edgeLen(start: RailNode, end: RailNode):
-        return (taxi(start, end) + euclid(start, end)) / 2
-
-    def find_next_node():
-        return min(open_list, key=lambda k: open_list[k]["f"])
-
-    def get_node(name, current_node):
-        if aura_routing:
-            a = aura_node(name)
-            if a.type == "line":
-                a.x, a.z = current_node.x, current_node.z
-            return a
-        return kani_node(name)
-
-    while not len(open_list) == 0:
-        current_name = find_next_node()
-        current = open_list.pop(current_name)
-        closed_list.update({current_name: current})
-        current_node, f, g = current["node"], current["f"], current["g"]
+    x, z = graph.x, graph.z
+    if graph.aura:  # line nodes get their coordinates during the search, so work on a copy
+        x, z = list(x), list(z)
+    end_x, end_z = x[end], z[end]
+    offsets, targets, weights, line, stop = graph.offsets, graph.targets, graph.weights, graph.line, graph.stop
+
+    # Per-search scratch state, indexed by node id. `order` is when a node was first put on the open list
+    # (-1 if never): heap ties are broken on it, so equal f scores pop in the same order a scan would find them.
+    # Improved scores are pushed again and the stale entries skipped once the node is closed.
+    g = [0] * len(graph)
+    parent = [-1] * len(graph)
+    order = [-1] * len(graph)
+    closed = [False] * len(graph)
+    order[start] = 0
+    open_heap = [(dist([x[start], z[start]], [end_x, end_z]), 0, start)]
+    pushed = 1
+
+    expanded = 0
+    while not len(open_heap) == 0:
+        current = heappop(open_heap)[2]
+        if closed[current]:
+            continue
+        closed[current] = True
+        expanded += 1
 
         # If we've reached our destination no need to continue
-        if current_node == end_node:
-            if type(current_node) == AuraNode:
-                return reconstruct_aura_path(current_node)
-            return reconstruct_path(current_node)
+        if current == end:
+            if stats is not None:
+                stats["expanded"] = stats.get("expanded", 0) + expanded
+            if graph.aura:
+                return reconstruct_aura_path(graph, current, parent, x, z)
+            return reconstruct_path(graph, current, parent)
 
         # Can't leave node, only applicable as destination
-        if current_node.stop and current_node != start_node:
+        if stop[current] and current != start:
             continue
 
-        for link in current_node.links:
-            if link in closed_list:  # This is a literal copout so AURA can work correctly
+        for i in range(offsets[current], offsets[current + 1]):
+            link = targets[i]
+            if closed[link]:  # This is a literal copout so AURA can work correctly
                 continue
-            if link in open_list:
-                link_node = open_list[link]["node"]
-                link_g = open_list[link]["g"]
+            if order[link] != -1:
+                link_g = g[link]
             else:
-                link_node = get_node(link, current_node)
                 link_g = -1
+                order[link] = pushed
+                pushed += 1
+                if line[link]:
+                    x[link], z[link] = x[current], z[current]
 
-            tentative_gscore = g + edgeLen(current_node, link_node)
+            if line[current] or line[link]:
+                tentative_gscore = g[current] + edge_length(x[current], z[current], x[link], z[link])
+            else:
+                tentative_gscore = g[current] + weights[i]
             if link_g == -1 or tentative_gscore < link_g:
-                link_node.parent = current_node
-                new_dict = {"node": link_node,
-                 "f": tentative_gscore + euclid(link_node, end_node),
-                 "g": tentative_gscore}
-                open_list.update({link: new_dict})
+                parent[link] = current
+                g[link] = tentative_gscore
+                heappush(open_heap, (tentative_gscore + dist([x[link], z[link]], [end_x, end_z]), order[link], link))
 
+    if stats is not None:
+        stats["expanded"] = stats.get("expanded", 0) + expanded
     return [], 0
 
 
-def get_aliases():
-    """Gets aliases for all KANI destinations. Run as a coroutine in get_kani_json, saves to KANI_ALIASES"""
+def near(a: float, b: float):
+    """Whether two route lengths are equal or within TIE_TOLERANCE of each other, and so may be settled
+    differently by searches that explore in a different order."""
+    return a != inf and b != inf and abs(a - b) <= TIE_TOLERANCE * max(abs(a), abs(b), 1.0)
+
+
+def alt_search(landmarks: Landmarks, start: int, end: int, stats: dict = None):
+    """A* over a static-cost (KANI) graph, guided by the landmark bounds instead of the straight line alone, with the
+    same stop rule as astar. After reaching `end` it keeps going through every node that could still lie on an
+    equally short route, and returns None if the route it found has such an alternative anywhere along it: which
+    of those astar picks depends on its search order, so tied routes are left to astar. Any other route is the only
+    shortest one, which astar finds as well, so the results are identical."""
+    if start == end:
+        return [], -2
+    graph = landmarks.graph
+    h = landmarks.bounds(end)
+    if h[start] == inf:
+        return [], 0
+    offsets, targets, weights, stop = graph.offsets, graph.targets, graph.weights, graph.stop
+
+    # `alt` marks nodes reached by a second route of (nearly) the same length as their best one
+    g = [inf] * len(graph)
+    parent = [-1] * len(graph)
+    closed = [False] * len(graph)
+    alt = [False] * len(graph)
+    g[start] = 0
+    heap = [(h[start], start)]
+    limit = inf
+    expanded = 0
+
+    while len(heap) != 0:
+        f, current = heappop(heap)
+        if f > limit:
+            break
+        if closed[current]:
+            continue
+        closed[current] = True
+        expanded += 1
+        if current == end:
+            limit = g[end] * (1 + TIE_TOLERANCE) + TIE_TOLERANCE
+            continue
+        if stop[current] and current != start:
+            continue
+
+        for i in range(offsets[current], offsets[current + 1]):
+            link = targets[i]
+            if h[link] == inf:  # can't reach the end from there
+                continue
+            tentative_gscore = g[current] + weights[i]
+            if tentative_gscore < g[link] and not closed[link]:
+                alt[link] = near(tentative_gscore, g[link])  # a clearly shorter route ends any earlier tie
+                parent[link] = current
+                g[link] = tentative_gscore
+                heappush(heap, (tentative_gscore + h[link], link))
+            elif near(tentative_gscore, g[link]):
+                alt[link] = True
+
+    if stats is not None:
+        stats["expanded"] = stats.get("expanded", 0) + expanded
+    if not closed[end]:
+        return [], 0
+    node = end
+    while node != -1:
+        if alt[node]:
+            return None
+        node = parent[node]
+    return reconstruct_path(graph, end, parent)
+
+
+def bidirectional_search(landmarks: Landmarks, start: int, end: int, stats: dict = None):
+    """Bidirectional A* over a static-cost (KANI) graph: searches forwards from `start` and backwards from `end`
+    (over the reversed links kept with the landmarks) until the two meet on the shortest route. Both sides use the
+    average of the landmark bounds towards `end` and from `start` as their potential, which keeps the two searches
+    consistent with each other. Follows the same stop rule as astar, and like alt_search returns None if the route
+    has an equally short alternative, so only routes astar would find as well are returned."""
+    if start == end:
+        return [], -2
+    graph = landmarks.graph
+    stop = graph.stop
+    to_end, from_start = landmarks.bounds(end), landmarks.bounds(start, reverse=True)
+    if to_end[start] == inf:
+        return [], 0
+    potential = [(t - f) / 2 for t, f in zip(to_end, from_start)]
+
+    sides = []
+    for origin, adjacency, sign, reachable in ((start, (graph.offsets, graph.targets, graph.weights), 1, to_end),
+                                               (end, landmarks.reverse, -1, from_start)):
+        g = [inf] * len(graph)
+        g[origin] = 0
+        # (g, parent, closed, alt, heap, adjacency, potential sign, bounds, labelled nodes), one for each direction
+        sides.append((g, [-1] * len(graph), [False] * len(graph), [False] * len(graph),
+                      [(sign * potential[origin], origin)], adjacency, sign, reachable, [origin]))
+    forward, backward = sides
+    best, meet = inf, -1
+    expanded = 0
+
+    while len(forward[4]) != 0 and len(backward[4]) != 0:
+        if forward[4][0][0] + backward[4][0][0] > best * (1 + TIE_TOLERANCE) + TIE_TOLERANCE:
+            break
+        side, other = (forward, backward) if forward[4][0][0] <= backward[4][0][0] else (backward, forward)
+        g, parent, closed, alt, heap, (offsets, targets, weights), sign, reachable, labelled = side
+        current = heappop(heap)[1]
+        if closed[current]:
+            continue
+        closed[current] = True
+        expanded += 1
+        # Forwards, stop nodes are only left at the start; backwards, they can only be reached at the start
+        if side is forward and stop[current] and current != start:
+            continue
+
+        for i in range(offsets[current], offsets[current + 1]):
+            link = targets[i]
+            if reachable[link] == inf or (side is backward and stop[link] and link != start):
+                continue
+            tentative_gscore = g[current] + weights[i]
+            if tentative_gscore < g[link] and not closed[link]:
+                alt[link] = near(tentative_gscore, g[link])  # a clearly shorter route ends any earlier tie
+                if g[link] == inf:
+                    labelled.append(link)
+                parent[link] = current
+                g[link] = tentative_gscore
+                heappush(heap, (tentative_gscore + sign * potential[link], link))
+                if g[link] + other[0][link] < best:
+                    best, meet = g[link] + other[0][link], link
+            elif near(tentative_gscore, g[link]):
+                alt[link] = True
+
+    if stats is not None:
+        stats["expanded"] = stats.get("expanded", 0) + expanded
+    if meet == -1:
+        return [], 0
+
+    # The route is the forward tree up to the meeting node, then the backward tree down to the end
+    path, node = [], meet
+    while node != -1:
+        path.append(node)
+        node = forward[1][node]
+    path.reverse()
+    middle = len(path) - 1
+    node = backward[1][meet]
+    while node != -1:
+        path.append(node)
+        node = backward[1][node]
+
+    if any(forward[3][node] for node in path[:middle + 1]) or any(backward[3][node] for node in path[middle:]):
+        return None
+    # Any node off the route that both searches reached, adding up to (nearly) the same length, is on another one
+    on_path = set(path)
+    for node in backward[8]:
+        if node not in on_path and forward[0][node] + backward[0][node] <= best * (1 + TIE_TOLERANCE) + \
+                TIE_TOLERANCE:
+            return None
+
+    parents = list(forward[1])
+    for previous, node in zip(path[middle:], path[middle + 1:]):
+        parents[node] = previous
+    return reconstruct_path(graph, end, parents)
+
+
+def search_route(graph: RailGraph, landmarks: Landmarks, start: int, end: int):
+    """Routes between two nodes of a static-cost graph that has no route table, with alt_search (or
+    bidirectional_search, if SEARCH_MODE says so). Tied routes go to astar, so every answer is what astar gives;
+    so does every route when there are no landmarks for the graph."""
+    if landmarks is None:
+        return astar(graph, start, end)
+    search = bidirectional_search if SEARCH_MODE == "bidirectional" else alt_search
+    route = search(landmarks, start, end)
+    if route is None:
+        return astar(graph, start, end)
+    return route
+
+
+def get_aliases(kani_json: dict):
+    """Gets aliases for all KANI destinations. Run in build_kani, saves to KANI_ALIASES"""
     alias_dict = {}
-    for key in KANI_JSON.keys():
+    for key in kani_json.keys():
         alias_dict[key] = key
-        for alias in KANI_JSON[key].get("aliases", []):
+        for alias in kani_json[key].get("aliases", []):
             alias_dict[alias] = key
     return alias_dict
 
 
+def get_aura_names():
+    """Gets the names /dest accepts for every routable AURA node (its key and its lowercased display name), for
+    the station search. Rebuilt alongside the aliases whenever KANI or AURA refreshes."""
+    names = {}
+    for key, node in AURA_JSON.get("nodes", {}).items():
+        if node.get("type") in ["switch", "crossing", "junction", "line"]:
+            continue
+        names[key] = key
+        for name in node_names(node):
+            names.setdefault(name.lower(), key)
+    return names
+
+
+def build_station_search(kani_aliases: dict, aura_names: dict):
+    """Builds the station search index and autocomplete trie from the KANI aliases and AURA names. Both are built
+    in full before being swapped in, so lookups during a refresh see either the old or the new names."""
+    return StationIndex(kani_aliases, aura_names), StationTrie(kani_aliases, aura_names)
+
+
 def kani_node(s: str):
     """Helper function to return a KANI type node from a string, if the string matches."""
     try:
@@ -322,37 +596,60 @@ def kani_node(s: str):
 
 
 def aura_node(s: str):
-    """Helper function to return an AURA type node from a string, if the string matches."""
-    nodes = AURA_JSON.get("nodes")
-    find_node = nodes.get(s)
-    if find_node is not None:
-        return AuraNode(s, AURA_JSON["nodes"][s])
-    valid_keys = []
-    for d in nodes.keys():
-        if s.lower() in [name.lower() for name in nodes.get(d).get("name", [])]:
-            valid_keys.append(d)
-            break
-
-    if len(valid_keys) != 0:
-        return AuraNode(valid_keys[0], AURA_JSON["nodes"][valid_keys[0]])
-    return None
+    """Helper function to return an AURA type node from a string, if the string matches. Matches node keys
+    exactly, or display names case-insensitively (the first node with that name wins)."""
+    key = s if s in AURA_NODES else AURA_NAMES.get(s.lower())
+    if key is None:
+        return None
+    return AURA_NODES[key]
+
+
+def aura_dest_node(s: str):
+    """Helper function to return the AURA node a /dest string from a route leads to, falling back to aura_node."""
+    key = AURA_DEST_NODES.get(s)
+    if key is None:
+        return aura_node(s)
+    return AURA_NODES[key]
+
+
+def node_names(data: dict):
+    """Returns the display names of an AURA node, which are given as either a single name or a list of them."""
+    names = data.get("name") or []
+    return [name for name in ([names] if isinstance(names, str) else names) if name != ""]
+
+
+def index_aura(aura_json: dict):
+    """Builds the AURA lookup tables whenever AURA_JSON reloads: one reused AuraNode per key, lowercased display
+    names -> key, and the /dest strings found in routes -> key of the node they lead to. A node's own dests take
+    precedence over the bad link and line dests other nodes use to reach it."""
+    nodes, names, dests = {}, {}, {}
+    data = aura_json.get("nodes", {})
+    for key, d in data.items():
+        nodes[key] = AuraNode(key, d)
+        for name in node_names(d):
+            names.setdefault(name.lower(), key)
+        for field in ["dest", "dest_stop", "dest_junction", "dest_a", "dest_b"]:
+            if d.get(field):
+                dests.setdefault(d[field], key)
+    for key, d in data.items():
+        for target, dest in list(d.get("bad_links", {}).items()) + list(d.get("link_dests", {}).items()):
+            dests.setdefault(dest, target)
+    return nodes, names, dests
 
 
 def find_alias(dest: str):
     """Finds dest names close to a string. Checks for substring matching, and uses aliases."""
-    dest_list = set()
-    for key in KANI_ALIASES:
-        d = KANI_ALIASES[key]
-        if dest in key and d not in dest_list:
-            dest_list.add(d)
-
-    return dest_list
+    return STATION_SEARCH.containing(dest, aura=False)
 
 
 def names_close_to(dest: str):
-    """Finds names close to a string based on difflib."""
-    close_matches = difflib.get_close_matches(dest, KANI_ALIASES.keys())
-    return set([KANI_ALIASES[key] for key in close_matches])
+    """Finds KANI and AURA station names within a small edit distance of a string, for suggestions."""
+    return set(STATION_SEARCH.close_to(dest))
+
+
+def complete_station(prefix: str):
+    """Returns /dest autocomplete choices, as (label, value) pairs, for a partly typed station name."""
+    return STATION_TRIE.complete(prefix.strip())
 
 
 def get_advisories(dest_list: List[str]):
@@ -398,21 +695,21 @@ def aura_formatting(path, dist):
 
     elif len(path) > 0:
         aura_notices = []
-        orig = aura_node(path[0])
-        dest = aura_node(path[-1])
+        orig = aura_dest_node(path[0])
+        dest = aura_dest_node(path[-1])
         valid_stops = ["stop", "junctionstop", "stopjunction"]
 
         # Surface check
-        if orig.name + "-surface" in AURA_JSON["nodes"]:
-            aura_notices += "AURA Notice: Your origin has a surface station that you may want to check for better " \
-                            "routes. Add '(surface)' to your origin input."
-        if dest.name + "-surface" in AURA_JSON["nodes"]:
-            aura_notices += "AURA Notice: Your destination has a surface station that you may want to check for " \
-                            "better routes. Add '(surface)' to your destination input."
+        if orig is not None and orig.name + "-surface" in AURA_NODES:
+            aura_notices.append("AURA Notice: Your origin has a surface station that you may want to check for "
+                                "better routes. Add '(surface)' to your origin input.")
+        if dest is not None and dest.name + "-surface" in AURA_NODES:
+            aura_notices.append("AURA Notice: Your destination has a surface station that you may want to check for "
+                                "better routes. Add '(surface)' to your destination input.")
 
         # Non-valid stop
-        if dest.type not in valid_stops:
-            aura_notices += "AURA Notice: You are not routing to a stop."
+        if dest is not None and dest.type not in valid_stops:
+            aura_notices.append("AURA Notice: You are not routing to a stop.")
 
         notices = "".join([f"\n> -{i}" for i in aura_notices])
         route = "/dest " + " ".join(path)
@@ -425,5 +722,12 @@ def aura_formatting(path, dist):
             .format(route, min, sec, int(dist), notices)
 
 AURA_JSON = load_aura_json()
+AURA_NODES, AURA_NAMES, AURA_DEST_NODES = index_aura(AURA_JSON)
 KANI_JSON = load_kani_json()
-KANI_ALIASES = get_aliases()
+KANI_ALIASES, STATION_SEARCH, STATION_TRIE, KANI_GRAPH, KANI_ROUTES, KANI_LANDMARKS, KANI_DESTS = \
+    build_kani(KANI_JSON, get_aura_names())
+AURA_GRAPH = compile_aura(AURA_JSON)
+AURA_DESTS = aura_dests(AURA_JSON)
+annotate_dests()
+CivMap.claims_refreshed.append(annotate_dests)
+GRAPH_VERSION = 0
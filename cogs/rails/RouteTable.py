@@ -0,0 +1,94 @@
+import logging
+import numpy as np
+import time
+from heapq import heappop, heappush
+from .RailGraph import RailGraph
+
+
+class RouteTable:
+    """All-pairs shortest route table for a compiled graph, built with a Dijkstra search from every node.
+    `pred[s, v]` is the node before `v` on the best route from `s` (-1 if `v` is unreachable or `v == s`), and
+    `dist[s, v]` the route length (inf if unreachable). Paths are rebuilt from the predecessor row on lookup.
+    `tied[s, v]` marks routes where another route of exactly the same length exists; A* may settle those ties
+    differently depending on the destination, so they are left to astar."""
+    __slots__ = ("graph", "pred", "dist", "tied")
+
+    def __init__(self, graph: RailGraph):
+        self.graph = graph
+        n = len(graph)
+        dtype = np.int16 if n < np.iinfo(np.int16).max else np.int32
+        self.pred = np.full((n, n), -1, dtype=dtype)
+        self.dist = np.full((n, n), np.inf, dtype=np.float32)
+        self.tied = np.zeros((n, n), dtype=bool)
+        for source in range(n):
+            g, parent, tied = shortest_paths(graph, source)
+            self.pred[source] = parent
+            self.dist[source] = [d if d is not None else np.inf for d in g]
+            self.tied[source] = tied
+
+    def parents(self, start: int):
+        """Returns the predecessor row for `start` as a list, in the same form A* leaves its parent list."""
+        return self.pred[start].tolist()
+
+    def reachable(self, start: int, end: int):
+        return bool(np.isfinite(self.dist[start, end]))
+
+    def exact(self, start: int, end: int):
+        """Whether the table's route between two nodes is the one A* would find."""
+        return not self.tied[start, end]
+
+    @property
+    def nbytes(self):
+        return self.pred.nbytes + self.dist.nbytes + self.tied.nbytes
+
+
+def shortest_paths(graph: RailGraph, source: int):
+    """Dijkstra search from `source` over a KANI graph. Follows the same rules as astar: stop nodes can only be
+    the end of a route, and only strictly shorter routes replace a parent. Returns (g, parent, tied) lists by node
+    id, where tied marks nodes whose route (or a route it extends) had an equally short alternative."""
+    offsets, targets, weights, stop = graph.offsets, graph.targets, graph.weights, graph.stop
+    g = [None] * len(graph)
+    parent = [-1] * len(graph)
+    order = [-1] * len(graph)
+    closed = [False] * len(graph)
+    tied = [False] * len(graph)
+    g[source], order[source] = 0, 0
+    heap = [(0, 0, source)]
+    pushed = 1
+
+    while len(heap) != 0:
+        current = heappop(heap)[2]
+        if closed[current]:
+            continue
+        closed[current] = True
+        if parent[current] != -1 and tied[parent[current]]:
+            tied[current] = True
+        if stop[current] and current != source:
+            continue
+
+        for i in range(offsets[current], offsets[current + 1]):
+            link = targets[i]
+            if closed[link]:
+                continue
+            if order[link] == -1:
+                order[link] = pushed
+                pushed += 1
+            tentative_gscore = g[current] + weights[i]
+            if g[link] is None or tentative_gscore < g[link]:
+                parent[link] = current
+                g[link] = tentative_gscore
+                tied[link] = False
+                heappush(heap, (tentative_gscore, order[link], link))
+            elif tentative_gscore == g[link]:
+                tied[link] = True
+
+    return g, parent, tied
+
+
+def build_route_table(graph: RailGraph):
+    """Builds the route table for a graph, logging how long it took and how much memory it uses."""
+    start = time.perf_counter()
+    table = RouteTable(graph)
+    logging.info("Built route table for {0} nodes in {1:.2f}s ({2:.1f} KiB)"
+                 .format(len(graph), time.perf_counter() - start, table.nbytes / 1024))
+    return table
@@ -0,0 +1,149 @@
+import numpy as np
+
+
+def trigrams(text: str):
+    """Returns the set of 3-character substrings of a string."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def bounded_distance(a: str, b: str, k: int):
+    """Edit distance between two strings, counting a swap of two neighbouring characters as one edit (optimal
+    string alignment), or k + 1 as soon as it is known to be more than `k`. Only the band of cells within `k` of
+    the diagonal is filled in, since any path leaving it already costs more."""
+    if abs(len(a) - len(b)) > k:
+        return k + 1
+    far = k + 1
+    before, previous = None, [j if j <= k else far for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        lo, hi = max(1, i - k), min(len(b), i + k)
+        current = [far] * (len(b) + 1)
+        current[0] = i if i <= k else far
+        ca = a[i - 1]
+        for j in range(lo, hi + 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != b[j - 1]), far)
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == b[j - 1]:
+                cost = min(cost, before[j - 2] + 1)
+            current[j] = cost
+        if min(current[lo - 1:hi + 1]) > k:
+            return far
+        before, previous = previous, current
+    return previous[-1]
+
+
+class StationIndex:
+    """Search index over station names for /dest suggestions, shared by KANI (names and aliases) and AURA (node
+    keys and display names). Every searchable string is an entry pointing at the station it names. Substring
+    matches are found through trigram postings (they must contain every trigram of the query), and fuzzy matches
+    through the length and character counts of every entry, compared all at once, so only a few entries ever get
+    compared in full."""
+    __slots__ = ("texts", "lowered", "targets", "aura", "postings", "alphabet", "lengths", "counts")
+
+    def __init__(self, kani_aliases: dict, aura_names: dict):
+        self.texts, self.targets, self.aura = [], [], []
+        for names, aura in ((kani_aliases, False), (aura_names, True)):
+            for text, target in names.items():
+                self.texts.append(text)
+                self.targets.append(target)
+                self.aura.append(aura)
+
+        self.lowered = [text.lower() for text in self.texts]
+        self.postings = {}  # trigram -> entry ids, in entry order
+        for i, text in enumerate(self.texts):
+            for gram in trigrams(text):
+                self.postings.setdefault(gram, []).append(i)
+
+        # Character counts of every lowercased entry, one column per character, for the fuzzy search's prefilter
+        self.alphabet = {char: column for column, char in enumerate(sorted(set("".join(self.lowered))))}
+        self.lengths = np.array([len(text) for text in self.lowered], dtype=np.int32)
+        self.counts = np.zeros((len(self.lowered), len(self.alphabet) + 1), dtype=np.int16)
+        columns = np.fromiter((self.alphabet[char] for text in self.lowered for char in text), dtype=np.int32,
+                              count=int(self.lengths.sum()))
+        np.add.at(self.counts, (np.repeat(np.arange(len(self.lowered)), self.lengths), columns), 1)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def _systems(self, aura):
+        """Entry filter for `aura`: None searches both systems, otherwise only AURA (True) or KANI (False)."""
+        return lambda i: aura is None or self.aura[i] == aura
+
+    def containing(self, query: str, aura=None):
+        """Returns the stations with a name containing `query` (case-sensitive, like a plain `in` test)."""
+        wanted = self._systems(aura)
+        grams = trigrams(query)
+        if len(grams) == 0:  # too short to have a trigram, check everything
+            ids = range(len(self.texts))
+        else:
+            postings = sorted((self.postings.get(gram, []) for gram in grams), key=len)
+            ids = set(postings[0]).intersection(*postings[1:])
+        return {self.targets[i] for i in ids if wanted(i) and query in self.texts[i]}
+
+    def _similar_counts(self, query: str, k: int):
+        """Entries that could be within `k` edits of a (lowercased) query going by their length and character
+        counts alone: an edit adds and/or removes at most one character (a swap neither), so a match can't have
+        more than k characters the query lacks, nor lack more than k of the query's."""
+        wanted = np.zeros(self.counts.shape[1], dtype=np.int16)
+        for char in query:
+            wanted[self.alphabet.get(char, -1)] += 1  # characters no entry has share the last column
+        close = np.abs(self.lengths - len(query)) <= k
+        difference = self.counts[close] - wanted
+        extra = np.clip(difference, 0, None).sum(axis=1)
+        missing = np.clip(-difference, 0, None).sum(axis=1)
+        return np.flatnonzero(close)[(extra <= k) & (missing <= k)].tolist()
+
+    def close_to(self, query: str, n: int = 3, aura=None):
+        """Returns up to `n` stations whose name is within a small edit distance of `query` (case-insensitive),
+        closest first. The allowed distance grows with the length of the query: 1 below 8 characters, then one
+        more for every 4."""
+        wanted = self._systems(aura)
+        query = query.lower()
+        k = max(1, len(query) // 4)
+        ids = self._similar_counts(query, k)
+
+        ranked = []
+        for i in ids:
+            if not wanted(i):
+                continue
+            text = self.lowered[i]
+            distance = bounded_distance(query, text, k)
+            if distance <= k:
+                ranked.append((distance, abs(len(text) - len(query)), text, self.targets[i]))
+
+        matches = []
+        for _, _, _, target in sorted(ranked):
+            if target not in matches:
+                matches.append(target)
+            if len(matches) == n:
+                break
+        return matches
+
+
+
+class StationTrie:
+    """Prefix trie over the same names as StationIndex (lowercased), for /dest autocomplete. Every trie node keeps
+    the first `limit` completions below it, shortest first, so answering a keystroke only walks the typed prefix.
+    Completions are (label, value) pairs: the value is the station /dest should get, and the label shows the
+    typed name along with the station when they differ (ie. for an alias)."""
+    __slots__ = ("root", "limit")
+
+    def __init__(self, kani_aliases: dict, aura_names: dict, limit: int = 25):
+        self.limit = limit
+        self.root = ({}, [])  # (children by character, completions)
+        entries = {(text.lower(), target) for names in (kani_aliases, aura_names) for text, target in names.items()}
+        for text, target in sorted(entries, key=lambda e: (len(e[0]), e)):
+            completion = (text if text == target else "{0} ({1})".format(text, target), target)
+            node = self.root
+            for depth in range(len(text) + 1):
+                if len(node[1]) < limit and completion not in node[1]:
+                    node[1].append(completion)
+                if depth < len(text):
+                    node = node[0].setdefault(text[depth], ({}, []))
+
+    def complete(self, prefix: str):
+        """Returns the completions for a typed prefix (case-insensitive), at most `limit` of them."""
+        node = self.root
+        for char in prefix.lower():
+            node = node[0].get(char)
+            if node is None:
+                return []
+        return list(node[1])
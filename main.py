@@ -1,10 +1,10 @@
-import asyncio
 import log
 import logging
 import os
 import random
-import requests
-from cogs import Settings
+import time
+from cogs import Compute, DataFetch, Metrics, Profiling, Settings
+from cogs.CommandRegistry import CommandRegistry, sync_options
 from discord import Intents, Embed
 from discord.ext import commands
 from discord_slash import SlashCommand, SlashContext
@@ -15,15 +15,70 @@ class Bot(commands.Bot):
     def __init__(self, intents):
         super().__init__(command_prefix="%", help_command=None, intents=intents)
 
+    async def start(self, *args, **kwargs):
+        """Opens the database pool and the metrics endpoint before connecting to Discord."""
+        await Settings.create_pool()
+        Metrics.serve()
+        await super().start(*args, **kwargs)
+
+    async def close(self):
+        """Closes the shared HTTP session, database pool and compute threads along with the bot."""
+        await DataFetch.close_session()
+        await Settings.close_pool()
+        Compute.shutdown()
+        await super().close()
+
+
+class Slash(SlashCommand):
+    """discord_slash 2.4 doesn't know about autocomplete interactions (type 4) and raises on them, so those are
+    dispatched to cogs as an `autocomplete` event carrying the raw interaction instead, and commands whose options
+    only changed in `autocomplete` are registered again before syncing (see sync_options).
+    Also times every command, and counts the ones that raise, for the metrics endpoint, profiles the runs
+    picked for sampling, and rebuilds the /help registry whenever the commands are synced (at startup, and when an
+    extension is reloaded)."""
+    async def on_socket_response(self, msg):
+        if msg["t"] == "INTERACTION_CREATE" and msg["d"]["type"] == 4:
+            self._discord.dispatch("autocomplete", msg["d"])
+            return
+        await super().on_socket_response(msg)
+
+    async def sync_all_commands(self, *args, **kwargs):
+        try:
+            await sync_options(self)  # changes to `autocomplete` alone, which the sync below can't see
+            await super().sync_all_commands(*args, **kwargs)
+        finally:  # built from our own commands, so /help is up to date even if the sync failed
+            registry.build((await self.to_dict())["global"])
+            logging.info("Built /help for {0} commands".format(len(registry)))
+
+    async def invoke_command(self, func, ctx, args):
+        # discord_slash catches errors itself and hands them to on_slash_command_error, where they are counted
+        labels = command_labels(ctx)
+        start = time.perf_counter()
+        async with Profiling.sampled(labels[0]):
+            await super().invoke_command(func, ctx, args)
+        Metrics.COMMAND_SECONDS.labels(*labels).observe(time.perf_counter() - start)
+
+    async def on_slash_command_error(self, ctx, ex):
+        Metrics.COMMAND_ERRORS.labels(*command_labels(ctx)).inc()
+        await super().on_slash_command_error(ctx, ex)
+
+
+def command_labels(ctx: SlashContext):
+    """Metric labels for a command: its full name (ie. "config mole") and the bot's guild count bucket."""
+    name = " ".join(part for part in [ctx.name, ctx.subcommand_group, ctx.subcommand_name] if part)
+    return name, Metrics.guild_bucket(len(bot.guilds))
+
 
 bot = Bot(intents=Intents.default())
-slash = SlashCommand(bot, sync_commands=True)
-cogs = ["RailUtils", "ServerUtils", "Settings"]
+slash = Slash(bot, sync_commands=True, sync_on_cog_reload=True)
+registry = CommandRegistry()
+cogs = ["RailUtils", "ServerUtils", "Config", "Diagnostics", "Messages"]
 for extension in cogs:
     bot.load_extension("cogs." + extension)
 
 
 @bot.event
+@Metrics.listener
 async def on_slash_command(message):
     """Handler to log slash commands in console."""
     guild_name = bot.get_guild(message.guild_id)
@@ -37,19 +92,6 @@ async def on_slash_command(message):
         logging.info("'{0}' was sent via a DM".format(command))
 
 
-@bot.event
-async def on_message(message):
-    """Handler to do various funny things or ignoring of commands from console."""
-    if message.author.bot:
-        return
-    if message.author.id == bot.user.id:  # Ignore self
-        return
-    if "delusional" in message.content and "[[" not in message.content and \
-            not Settings.get_wiki_setting(message.guild.id):
-        await message.channel.send("**Edit CivWiki:** https://civwiki.org")
-        await asyncio.sleep(3)
-
-
 @slash.slash(name="mole", description="Mole guy")
 async def mole(ctx: SlashContext):
     """Handler for the /mole command, which literally spits out a mole because it's fun"""
@@ -81,44 +123,14 @@ async def mole(ctx: SlashContext):
                                     required=False)])
 async def help(ctx: SlashContext, command=""):
     """Displays a help command, and gives all commands/and also give other commands from the options."""
-    url = "https://discord.com/api/v8/applications/{0}/commands".format(os.environ.get("app_id"))
-    header = {"Authorization": "Bot " + os.environ.get("token")}
-    r = requests.get(url, headers=header)
-    cmds, out = r.json(), ""
-
-    commands = [cmd.get("name") for cmd in cmds]
-    if command in commands:
-        cmd = cmds[commands.index(command)]
-        name = cmd.get("name")
-        desc = cmd.get("description")
-        options = cmd.get("options", [])
-        embed = Embed(title="/" + name, description=desc)
-        out = ""
-        for option in options:
-            out += "`" + option.get("name") + "` - " + option.get("description")
-        if out != "":
-            embed.add_field(name="Options", value=out)
-        await ctx.send(embed=embed, hidden=True)
-
-    elif command == "":
-        embed = Embed(title="Hi, I'm MoleBot!",
-                      description="I'm a bot created by specificlanguage created to do simple Civ tasks, "
-                                  "like finding rail /dest commands or finding the closest place to a point; "
-                                  "but of course I also create moles as well. Use `/` for all commands!",
-                      url="https://c.tenor.com/z8JgskMjeuAAAAAC/yes-monty-mole.gif")
-        cds = sorted(commands)
-        out = []
-        for cmd in cds:
-            c = cmds[commands.index(cmd)]
-            out.append("`" + c.get("name") + "` - " + c.get("description"))
-
-        embed.add_field(name="Commands:", value="\n".join(out), inline=True)
-        embed.add_field(name="Issues?", value="For any bugs, please make an issue at the GitHub at "
-                                              "https://github.com/specificlanguage/MoleBot", inline=False)
-        await ctx.reply(embed=embed, hidden=True)
-
-    else:
+    if command == "":
+        await ctx.reply(embed=registry.overview, hidden=True)
+        return
+    embed = registry.embed(command)
+    if embed is None:
         await ctx.reply("Command not found. Try `/help`?", hidden=True)
+        return
+    await ctx.send(embed=embed, hidden=True)
 
 
 @slash.slash(name="invite", description="Spread the mole to another server")
@@ -136,6 +148,7 @@ async def invite(ctx: SlashContext):
 
 
 @bot.event
+@Metrics.listener
 async def on_guild_join(guild):
     """Handler to set basic permissions, logging upon joining a new server."""
     logging.info("MoleBot has joined {0}! (id = {1})".format(guild.name, guild.id))
@@ -149,6 +162,7 @@ async def on_guild_join(guild):
 
 
 @bot.event
+@Metrics.listener
 async def on_guild_remove(guild):
     """Handler to remove permissions, log upon leaving a server."""
     logging.info("MoleBot has left {0}. (id = {1})".format(guild.name, guild.id))
@@ -156,8 +170,10 @@ async def on_guild_remove(guild):
 
 
 @bot.event
+@Metrics.listener
 async def on_ready():
-    """Just a base command to let you know MoleBot booted correctly"""
+    """Just a base command to let you know MoleBot booted correctly, also loads every server's settings."""
+    await Settings.load_settings()
     logging.info("MoleBot is ready!")
 
 logger = log.init_logger()